@@ -0,0 +1,136 @@
+#! /usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of Plotlines.
+
+# Plotlines is free software: You can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+
+# Plotlines is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the
+# GNU General Public License along with Plotlines.
+# If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Benchmarks for Plotlines.
+
+Usage:
+
+    python -m plotlines.bench memory --number 20000
+    python -m plotlines.bench merge --repeat 10
+    python -m plotlines.bench export --size 10000
+
+"""
+
+import argparse
+import gc
+import importlib.resources
+import pathlib
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+from plotlines.board import Board
+from plotlines.board import Node
+from plotlines.tree import Tree
+
+
+def memory(number: int = 20000, **kwargs) -> dict:
+    "Measure the bytes allocated per Node and per Edge of a chain of Nodes."
+    gc.collect()
+    tracemalloc.start()
+    try:
+        with Board() as board:
+            start = tracemalloc.get_traced_memory()[0]
+            nodes = [Node(zone=n % 10) for n in range(number)]
+            middle = tracemalloc.get_traced_memory()[0]
+            edges = [a.connect(b) for a, b in zip(nodes, nodes[1:])]
+            end = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "nodes": len(nodes),
+        "edges": len(edges),
+        "bytes/node": (middle - start) / len(nodes),
+        "bytes/edge": (end - middle) / max(1, len(edges)),
+    }
+
+
+def merge(repeat: int = 10, **kwargs) -> dict:
+    "Measure the time to parse and merge each of the SVG and XML test data files."
+    rv = {}
+    for path in sorted(importlib.resources.files("plotlines.test.data").iterdir(), key=lambda i: i.name):
+        if path.name.endswith((".svg", ".xml")):
+            text = path.read_text()
+            start = time.perf_counter()
+            for n in range(repeat):
+                with Board() as board:
+                    board.merge(ET.fromstring(text))
+            rv[path.name] = 1000 * (time.perf_counter() - start) / repeat
+    return {"ms/file": sum(rv.values()) / max(1, len(rv))} | {f"{k}/ms": v for k, v in rv.items()}
+
+
+def export(size: int = 10000, **kwargs) -> dict:
+    "Measure the time to generate and to write the Spiki tree of a board with branching Nodes."
+    with Board() as board:
+        nodes = [
+            Node(zone=n % 10, label=f"{n}", title=f"Scene {n}", contents=[f"Text of scene {n}."] * 3)
+            for n in range(size)
+        ]
+        edges = [a.connect(b, label=f"To {b.label}") for a, b in zip(nodes, nodes[1:])]
+        edges += [a.connect(b, label="Skip ahead") for a, b in zip(nodes[::2], nodes[2::2])]
+    board.extend(nodes + edges)
+    tree = Tree(board)
+
+    with tempfile.TemporaryDirectory() as parent:
+        parent = pathlib.Path(parent)
+        start = time.perf_counter()
+        files = sum(1 for text, path in tree(parent))
+        middle = time.perf_counter()
+        outcomes = tree.emit(parent)
+        end = time.perf_counter()
+
+    return {
+        "nodes": len(nodes),
+        "files": files,
+        "generate/s": middle - start,
+        "emit/s": end - middle,
+        "failed": Tree.tally(outcomes)["failed"],
+    }
+
+
+def main(args):
+    benchmarks = {fn.__name__: fn for fn in (memory, merge, export)}
+    for name in args.names or benchmarks:
+        result = benchmarks[name](**vars(args))
+        print(name, *(f"{k}={v:.1f}" if isinstance(v, float) else f"{k}={v}" for k, v in result.items()))
+    return 0
+
+
+def parser():
+    rv = argparse.ArgumentParser(usage=__doc__)
+    rv.add_argument("names", nargs="*", help="Select benchmarks to run [all]")
+    rv.add_argument("--number", type=int, default=20000, help="Set the number of Nodes [20000]")
+    rv.add_argument("--size", type=int, default=10000, help="Set the number of Nodes to export [10000]")
+    rv.add_argument("--repeat", type=int, default=10, help="Set the number of repetitions [10]")
+    return rv
+
+
+def run():
+    p = parser()
+    args = p.parse_args()
+    rv = main(args)
+    sys.exit(rv)
+
+
+if __name__ == "__main__":
+    run()
@@ -19,13 +19,17 @@
 
 from __future__ import annotations  # Until Python 3.14 is everywhere
 
+import array
 from collections import defaultdict
 from collections.abc import Generator
+from collections.abc import Iterable
+import contextvars
 import dataclasses
 from decimal import Decimal
 from fractions import Fraction
 import functools
 import html
+import io
 import itertools
 import logging
 import math
@@ -45,21 +49,240 @@ from plotlines.schema import NAMESPACE
 RGB = functools.partial(Coordinates, coerce=int)
 
 
-@dataclasses.dataclass(unsafe_hash=True)
+@dataclasses.dataclass(frozen=True, slots=True, weakref_slot=True)
 class Style:
+    pool: typing.ClassVar[weakref.WeakValueDictionary] = weakref.WeakValueDictionary()
+    keys: typing.ClassVar[weakref.WeakValueDictionary] = weakref.WeakValueDictionary()
+    default: typing.ClassVar[Style] = None
+
     stroke:     RGB = dataclasses.field(default=RGB(0, 0, 0), kw_only=True)
     fill:       RGB = dataclasses.field(default=RGB(255, 255, 255), kw_only=True)
     weight:     int = dataclasses.field(default=1, kw_only=True)
 
+    @classmethod
+    def share(cls, style: Style | dict | None = None) -> Style:
+        "Return the one instance of Style which is equal to the argument."
+        if not style:
+            return cls.default
+        if isinstance(style, Style):
+            return cls.pool.setdefault(style, style)
+
+        # Look the values up before making a new Style from them
+        key = (
+            tuple(style.get("stroke", cls.default.stroke)),
+            tuple(style.get("fill", cls.default.fill)),
+            style.get("weight", cls.default.weight),
+        )
+        rv = cls.keys.get(key)
+        if rv is None:
+            rv = cls.share(cls(**style))
+            cls.keys[key] = rv
+        return rv
+
+    def __post_init__(self):
+        object.__setattr__(self, "stroke", RGB(*self.stroke))
+        object.__setattr__(self, "fill", RGB(*self.fill))
+
+
+Style.default = Style.share(Style())
+
+
+class Registry(weakref.WeakValueDictionary):
+    """
+    A weak mapping of uid to Item, with the adjacency of Nodes to the Edges which join them.
+
+    When an Item is garbage collected its uid is queued, and it is removed along with
+    its entries in the side tables at the next change to the Registry, or when they are next read.
+
+    The Registry in which new Items are made is held in the context variable `active`.
+
+    """
+
+    class Ref(weakref.KeyedRef):
+        "A weak reference to an Item which remembers the Nodes it joined."
+
+        __slots__ = ("ends",)
+
+        def __new__(cls, ob, callback, key, ends=()):
+            rv = super().__new__(cls, ob, callback, key)
+            rv.ends = ends
+            return rv
+
+        def __init__(self, ob, callback, key, ends=()):
+            super().__init__(ob, callback, key)
+
+    active: typing.ClassVar[contextvars.ContextVar] = None
+
+    def __init__(self, *args, **kwargs):
+        self.dead = list()
+
+        def expire(ref, selfref=weakref.ref(self)):
+            self = selfref()
+            if self is not None:
+                self.dead.append((ref.key, ref.ends))
+
+        self.expire = expire
+        super().__init__(*args, **kwargs)
+        self.inbound = dict()
+        self.outbound = dict()
+        self.initial = dict()
+        self.terminal = dict()
+        self.max_id = 0
+        self.digits = 1
+        self.grid = None
+        self.dirty = dict()
+        self.unsaved = dict()
+
+    @staticmethod
+    def ends(edge: Edge) -> tuple[tuple, tuple]:
+        return tuple(i for i in edge.ports[0].joins if i != edge.uid), tuple(i for i in edge.ports[1].joins if i != edge.uid)
+
+    def __setitem__(self, key, item):
+        self.hold(key, item)
+
+    def hold(self, key, item, ends: tuple = ()):
+        """
+        Keep a weak reference to an Item, which queues its key and ends for `purge` once it is collected.
+
+        This replaces the KeyedRef which WeakValueDictionary would store in its `data`,
+        and is the one place which relies on that.
+
+        """
+        self.data[key] = self.Ref(item, self.expire, key, ends)
+
+    def clear(self):
+        super().clear()
+        for index in (self.inbound, self.outbound, self.initial, self.terminal, self.dirty, self.unsaved):
+            index.clear()
+        self.dead.clear()
+        self.grid = None
+
+    def forget(self, uid):
+        "Remove a uid from the side tables."
+        for index in (self.inbound, self.outbound, self.initial, self.terminal, self.dirty, self.unsaved):
+            index.pop(uid, None)
+        if self.grid is not None:
+            self.grid.discard(uid)
+
+    def purge(self):
+        "Clear the side tables of Items which have been garbage collected."
+        while self.dead:
+            uid, ends = self.dead.pop()
+            if uid in self:
+                # Replaced by a live Item under the same uid
+                continue
+            self.pop(uid, None)
+            for node in ends:
+                self.detach(node, uid)
+            self.forget(uid)
+            self.survey(ends)
+
+    def detach(self, node, edge):
+        "Drop an Edge from the adjacency of a Node, deleting the tables it leaves empty."
+        for index in (self.inbound, self.outbound):
+            edges = index.get(node, ())
+            if edge in edges:
+                edges = tuple(i for i in edges if i != edge)
+                if edges:
+                    index[node] = edges
+                else:
+                    del index[node]
+
+    def survey(self, uids: set):
+        "Update the initial and terminal status of Nodes from their degree."
+        for uid in uids:
+            i_degree = len(self.inbound.get(uid, ()))
+            x_degree = len(self.outbound.get(uid, ()))
+            if x_degree and not i_degree:
+                self.initial[uid] = None
+            else:
+                self.initial.pop(uid, None)
+
+            if i_degree and not x_degree:
+                self.terminal[uid] = None
+            else:
+                self.terminal.pop(uid, None)
+
+    def link(self, edge: Edge):
+        if self.dead:
+            self.purge()
+        src, dst = self.ends(edge)
+        for uids, index in ((src, self.outbound), (dst, self.inbound)):
+            for uid in uids:
+                edges = index.get(uid, ())
+                if edge.uid not in edges:
+                    index[uid] = edges + (edge.uid,)
+        self.survey((*src, *dst))
+        self.touch(*src, *dst)
+
+        if self.get(edge.uid) is edge:
+            # So that the adjacency can be cleared if the Edge is garbage collected
+            self.hold(edge.uid, edge, (*src, *dst))
+
+    def unlink(self, edge: Edge):
+        src, dst = self.ends(edge)
+        for uid in (*src, *dst):
+            self.detach(uid, edge.uid)
+        self.survey((*src, *dst))
+
+    def touch(self, *uids: str):
+        "Mark Nodes as needing layout, and as changed since the Board was last saved."
+        self.dirty.update(dict.fromkeys(uids))
+        self.unsaved.update(dict.fromkeys(uids))
+
+    def allocate(self) -> int:
+        "Hand out the next free id."
+        self.track(self.max_id + 1)
+        return self.max_id
+
+    def track(self, id_: int):
+        "Keep the maximum id and its width in digits, which never shrinks."
+        if id_ > self.max_id:
+            self.max_id = id_
+            self.digits = len(str(id_))
+
+    def register(self, item: Item) -> Item:
+        if self.dead:
+            self.purge()
+        prior = item.store
+        if prior is not None and prior is not self and prior.get(item.uid) is item:
+            del prior[item.uid]
+            prior.forget(item.uid)
+        item.store = self
+        self[item.uid] = item
+        self.track(item.id)
+        if isinstance(item, Node):
+            self.touch(item.uid)
+        elif isinstance(item, Edge):
+            self.unsaved[item.uid] = None
+        return item
+
+    def adopt(self, items: list):
+        "Take ownership of items, moving them and their adjacency from any previous Registry."
+        for item in items:
+            if isinstance(item, Edge) and item.store is not self:
+                item.store.unlink(item)
+            if item.store is not self or self.get(item.uid) is not item:
+                # Items made in this Registry have their Ports registered with it already
+                ports = item.ports.values() if isinstance(item, Node) else getattr(item, "ports", [])
+                for port in ports:
+                    self.register(port)
+                self.register(item)
+            if isinstance(item, Edge):
+                self.link(item)
+
+
+Registry.active = contextvars.ContextVar("active", default=Registry())
 
-@dataclasses.dataclass(unsafe_hash=True)
-class Item:
-    store: typing.ClassVar[dict] = defaultdict(weakref.WeakValueDictionary)
 
+@dataclasses.dataclass(unsafe_hash=True, slots=True, weakref_slot=True)
+class Item:
     id:         int = dataclasses.field(default=0, kw_only=True)
     uid:        uuid.UUID = dataclasses.field(default_factory=uuid.uuid4, kw_only=True)
-    style:      Style = dataclasses.field(default_factory=Style, kw_only=True)
+    style:      Style = dataclasses.field(default=None, kw_only=True)
     label:      str = dataclasses.field(default="", kw_only=True)
+    store:      Registry = dataclasses.field(default=None, init=False, repr=False, compare=False)
+    state:      typing.Any = dataclasses.field(default=None, init=False, repr=False, compare=False)
 
     @staticmethod
     def key(val):
@@ -72,43 +295,37 @@ class Item:
             return val
 
     def __post_init__(self, *args):
-        try:
+        if isinstance(self.uid, str):
             self.uid = uuid.UUID(self.uid)
-        except AttributeError:
-            # Already a UUID
-            pass
-
-        try:
-            self.style = Style(**self.style)
-        except TypeError:
-            # Already a Style
-            pass
 
-        self.__class__.store[self.uid] = self
+        self.style = Style.share(self.style)
+        Registry.active.get().register(self)
 
     @property
     def name(self):
         if self.id:
-            max_id = max(i.id for i in self.store.values())
-            digits = math.ceil(math.log10(max_id))
-            return f"{{0:0{digits}d}}".format(self.id)
+            return format(self.id, f"0{self.store.digits}d")
         return format(self.uid)
 
 
 @dataclasses.dataclass(unsafe_hash=True)
 class Link:
-    joins:  set[Item] = dataclasses.field(default_factory=weakref.WeakSet, compare=False, kw_only=True)
+    __slots__ = ()
+
+    joins:  tuple = dataclasses.field(default=(), compare=False, kw_only=True)
 
 
 @dataclasses.dataclass(unsafe_hash=True)
 class Feature:
+    __slots__ = ()
+
     # TODO: Align with Balladeer Events
     title:      str = dataclasses.field(default="", kw_only=True)
     contents:   list = dataclasses.field(default_factory=list, compare=False, kw_only=True)
     triggers:   list = dataclasses.field(default_factory=list, compare=False, kw_only=True)
 
 
-@dataclasses.dataclass(unsafe_hash=True)
+@dataclasses.dataclass(unsafe_hash=True, slots=True)
 class Pin(Item):
     pos:        Coordinates = None
     area:       int = dataclasses.field(default=4, kw_only=True)
@@ -116,12 +333,12 @@ class Pin(Item):
     zone:       int = dataclasses.field(default=0, kw_only=True)
 
 
-@dataclasses.dataclass(unsafe_hash=True)
+@dataclasses.dataclass(unsafe_hash=True, slots=True)
 class Port(Pin, Link):
     pass
 
 
-@dataclasses.dataclass(unsafe_hash=True)
+@dataclasses.dataclass(unsafe_hash=True, slots=True)
 class Edge(Feature, Item):
     pos_0: dataclasses.InitVar[Coordinates | None] = None
     pos_1: dataclasses.InitVar[Coordinates | None] = None
@@ -135,34 +352,38 @@ class Edge(Feature, Item):
         rv = cls(*args, **kwargs)
 
         for n, port in enumerate(ports):
+            rv.store.pop(rv.ports[n].uid, None)
             rv.ports[n].uid = cls.key(port.get("uid", rv.ports[n].uid))
-            for val in port.get("joins", []):
-                rv.ports[n].joins.discard(val)
-                rv.ports[n].joins.add(cls.key(val))
+            rv.store.register(rv.ports[n])
+            joins = (*rv.ports[n].joins, *(cls.key(val) for val in port.get("joins", [])))
+            rv.ports[n].joins = tuple(dict.fromkeys(joins))
+        rv.store.link(rv)
         return rv
 
     def __post_init__(self, pos_0: tuple, pos_1: tuple, *args):
-        super().__post_init__(*args)
+        # Slotted dataclasses need the explicit form of super
+        super(Edge, self).__post_init__(*args)
+        if self.ports:
+            # Made along with its Ports, as from a snapshot
+            return
+
         coords = [Coordinates(*c) for c in (pos_0, pos_1) if c is not None]
         if coords:
             self.ports = [
-                Port(joins={self.uid}, pos=coords[0]),
-                Port(joins={self.uid}, pos=coords[-1]),
+                Port(joins=(self.uid,), pos=coords[0]),
+                Port(joins=(self.uid,), pos=coords[-1]),
             ]
         else:
-            self.ports = [Port(joins={self.uid}), Port(joins={self.uid})]
+            self.ports = [Port(joins=(self.uid,)), Port(joins=(self.uid,))]
 
-        self.style.stroke = RGB(*self.style.stroke)
-        self.style.fill = RGB(*self.style.fill)
+    @property
+    def ends(self) -> tuple[list[Node], list[Node]]:
+        "The Nodes at the start and end of the Edge, leaving out any which no longer exist."
+        return tuple([n for uid in uids if isinstance(n := self.store.get(uid), Node)] for uids in self.store.ends(self))
 
     @property
     def joins(self):
-        return [
-            n
-            for p in self.ports
-            for uid in p.joins
-            if isinstance(n := self.store.get(uid), Node) and uid != self.uid
-        ]
+        return [n for nodes in self.ends for n in nodes]
 
     def toml(self, scope="board.edges."):
         yield f'id          = {self.id}'
@@ -178,39 +399,149 @@ class Edge(Feature, Item):
             yield f"[[{scope}ports]]"
             yield f'uid         = "{port.uid}"'
             yield f'pos         = {list(port.pos or [])}'
-            yield f'joins       = {[str(i) for i in port.joins]}'
+            yield f'joins       = {sorted(str(i) for i in port.joins)}'
 
 
-@dataclasses.dataclass(unsafe_hash=True)
+class Grid:
+    """
+    A uniform grid of square cells which indexes the positions of Nodes and Ports by uid.
+
+    Queries visit only the cells around a point, so finding the nearest neighbour
+    of a Node costs little more than the number of items in its locality.
+
+    """
+
+    def __init__(self, size: float = 1):
+        self.size = size or 1
+        self.cells = defaultdict(dict)
+        self.where = dict()
+        self.lo = self.hi = None
+
+    @classmethod
+    def build(cls, items: list, size: float = None) -> Grid:
+        "Index the Nodes of `items` and their Ports, in cells of a size to hold a typical Node."
+        nodes = [i for i in items if isinstance(i, Node)]
+        size = size or max((max(i.width, i.height, math.sqrt(i.area)) for i in nodes), default=1)
+        rv = cls(size)
+        for node in nodes:
+            rv.update(node)
+        return rv
+
+    def __len__(self):
+        return len(self.where)
+
+    def __contains__(self, uid: str):
+        return uid in self.where
+
+    def cell(self, pos) -> tuple[int, int]:
+        return (math.floor(pos[0] / self.size), math.floor(pos[1] / self.size))
+
+    def add(self, uid: str, pos):
+        if uid in self.where:
+            self.discard(uid)
+        if pos is None:
+            return
+
+        cell = self.cell(pos)
+        self.cells[cell][uid] = pos
+        self.where[uid] = cell
+        if self.lo is None:
+            self.lo, self.hi = cell, cell
+        else:
+            self.lo = (min(self.lo[0], cell[0]), min(self.lo[1], cell[1]))
+            self.hi = (max(self.hi[0], cell[0]), max(self.hi[1], cell[1]))
+
+    def discard(self, uid: str):
+        cell = self.where.pop(uid, None)
+        if cell is not None:
+            self.cells[cell].pop(uid, None)
+            if not self.cells[cell]:
+                del self.cells[cell]
+
+    def update(self, node: Node):
+        "Index the current positions of a Node and its Ports."
+        self.add(node.uid, node.pos)
+        for port in node.ports.values():
+            self.add(port.uid, port.pos)
+
+    @staticmethod
+    def ring(cell: tuple[int, int], radius: int) -> Generator[tuple[int, int]]:
+        "Cells at a Chebyshev distance of `radius` from `cell`."
+        i, j = cell
+        if radius == 0:
+            yield cell
+            return
+
+        for di in range(-radius, radius + 1):
+            yield (i + di, j - radius)
+            yield (i + di, j + radius)
+        for dj in range(1 - radius, radius):
+            yield (i - radius, j + dj)
+            yield (i + radius, j + dj)
+
+    def reach(self, cell: tuple[int, int]) -> int:
+        "The number of rings which cover every occupied cell as seen from `cell`."
+        if self.lo is None:
+            return -1
+        return max(cell[0] - self.lo[0], self.hi[0] - cell[0], cell[1] - self.lo[1], self.hi[1] - cell[1])
+
+    def near(self, pos, radius: float) -> Generator[tuple[str, tuple]]:
+        "Generate uid and position of every indexed item within `radius` of `pos`."
+        cell = self.cell(pos)
+        span = math.ceil(radius / self.size)
+        for i, j in itertools.product(range(-span, span + 1), repeat=2):
+            for uid, other in self.cells.get((cell[0] + i, cell[1] + j), {}).items():
+                if math.dist(pos, other) <= radius:
+                    yield uid, other
+
+    def nearest(self, pos, exclude: set = frozenset(), within: set = None) -> tuple[float, str]:
+        "Find the closest item at a non-zero distance from `pos`, ignoring uids in `exclude` or not `within`."
+        cell = self.cell(pos)
+        rv = (math.inf, None)
+        for radius in range(self.reach(cell) + 1):
+            # Items in this ring or beyond are at least this far away
+            if (radius - 1) * self.size >= rv[0]:
+                break
+
+            for key in self.ring(cell, radius):
+                for uid, other in self.cells.get(key, {}).items():
+                    if (exclude and uid in exclude) or (within is not None and uid not in within):
+                        continue
+                    if 0 < (dist := math.dist(pos, other)) < rv[0]:
+                        rv = (dist, uid)
+        return rv
+
+
+@dataclasses.dataclass(unsafe_hash=True, slots=True)
 class Node(Feature, Pin):
     ports:  dict[int, Port] = dataclasses.field(default_factory=dict, compare=False)
+    width:  Number = dataclasses.field(default=0, init=False, repr=False, compare=False)
+    height: Number = dataclasses.field(default=0, init=False, repr=False, compare=False)
 
     @classmethod
     def build(cls, **kwargs):
         ports = {
-            k: Port(joins={cls.key(i) for i in v.pop("joins", [])}, **v)
+            k: Port(joins=tuple(dict.fromkeys(cls.key(i) for i in v.pop("joins", []))), **v)
             for k, v in kwargs.pop("ports", {}).items()
         }
         rv = cls(ports=ports, **kwargs)
         return rv
 
     def __post_init__(self, *args):
-        super().__post_init__(*args)
+        super(Node, self).__post_init__(*args)
         if self.pos:
             self.pos = Coordinates(*self.pos)
         for port in self.ports.values():
             port.pos = Coordinates(*port.pos)
 
-        self.style.stroke = RGB(*self.style.stroke)
-        self.style.fill = RGB(*self.style.fill)
-
     @property
     def nearby(self):
+        i_edges, x_edges = self.connections
         return [
             n
-            for edge in self.edges
-            for p in edge.ports
-            for uid in p.joins
+            for edges, end in ((i_edges, 0), (x_edges, 1))
+            for edge in edges
+            for uid in self.store.ends(edge)[end]
             if isinstance(n := self.store.get(uid), Node) and uid != self.uid
         ]
 
@@ -221,13 +552,13 @@ class Node(Feature, Pin):
 
     @property
     def edges(self):
-        return [e for p in self.ports.values() for uid in p.joins if isinstance(e := self.store.get(uid), Edge)]
+        i_edges, x_edges = self.connections
+        return i_edges + x_edges
 
     @property
     def connections(self):
-        edges = self.edges
-        i_edges = [edge for edge in edges if self.uid in edge.ports[1].joins]
-        x_edges = [edge for edge in edges if self.uid in edge.ports[0].joins]
+        i_edges = [e for uid in self.store.inbound.get(self.uid, ()) if isinstance(e := self.store.get(uid), Edge)]
+        x_edges = [e for uid in self.store.outbound.get(self.uid, ()) if isinstance(e := self.store.get(uid), Edge)]
         return (i_edges, x_edges)
 
     def handle(self, fmt="{0:02d}"):
@@ -235,11 +566,10 @@ class Node(Feature, Pin):
 
     def connect(self, other: Pin, *pos, edge=None, **kwargs):
         rv = edge or Edge(**kwargs)
-        rv.ports[0].joins.add(self.uid)
-        self.ports[self.handle()] = rv.ports[0]
-
-        rv.ports[1].joins.add(other.uid)
-        other.ports[other.handle()] = rv.ports[1]
+        for port, pin in zip(rv.ports, (self, other)):
+            if pin.uid not in port.joins:
+                port.joins += (pin.uid,)
+            pin.ports[pin.handle()] = port
 
         try:
             rv.ports[0].pos = pos[0]
@@ -247,6 +577,7 @@ class Node(Feature, Pin):
         except IndexError:
             pass
 
+        self.store.adopt([rv])
         return rv
 
     @functools.singledispatchmethod
@@ -277,10 +608,27 @@ class Node(Feature, Pin):
         }
         return rv
 
+    @spacing.register
+    def _(self, other: Grid) -> dict[tuple[Pin, Pin], Number]:
+        "Find the nearest indexed neighbour of this Node and of each of its Ports."
+        mine = [self] + list(self.ports.values())
+        exclude = {i.uid for i in mine}
+        rv = {}
+        for pin in mine:
+            if pin.pos is not None:
+                dist, uid = other.nearest(pin.pos, exclude=exclude)
+                if uid is not None:
+                    rv[(pin, self.store.get(uid))] = dist
+        return rv
+
     def translate(self, vec: Coordinates):
         self.pos += vec
         for port in self.ports.values():
-            port.pos += vec
+            if port.pos is not None:
+                port.pos += vec
+        if self.store.grid is not None:
+            self.store.grid.update(self)
+        self.store.touch(self.uid)
 
     def toml(self, scope="board.nodes."):
         yield f'id          = {self.id}'
@@ -299,7 +647,169 @@ class Node(Feature, Pin):
             yield f"[{scope}ports.{handle}]"
             yield f'uid         = "{port.uid}"'
             yield f'pos         = {list(port.pos or [])}'
-            yield f'joins       = {[str(i) for i in port.joins]}'
+            yield f'joins       = {sorted(str(i) for i in port.joins)}'
+
+
+class Graph:
+    "A compact view of Nodes and Edges as integer indices into array columns."
+
+    def __init__(self, nodes: list[Node], edges: list[Edge]):
+        self.nodes = nodes
+        self.index = {node.uid: n for n, node in enumerate(nodes)}
+
+        # An Edge with only one end on the Graph is kept, so its Port can be placed. The other end is -1
+        self.edges = []
+        self.src = array.array("q")
+        self.dst = array.array("q")
+        for edge in edges:
+            src, dst = [[self.index[uid] for uid in end if uid in self.index] for end in edge.store.ends(edge)]
+            if src or dst:
+                self.edges.append(edge)
+                self.src.append(src[0] if src else -1)
+                self.dst.append(dst[0] if dst else -1)
+
+        self.x = array.array("d", (node.pos[0] if node.pos else math.nan for node in nodes))
+        self.y = array.array("d", (node.pos[1] if node.pos else math.nan for node in nodes))
+        self.area = array.array("d", (node.area for node in nodes))
+        self.zone = array.array("q", (node.zone for node in nodes))
+        self.width = array.array("d", (node.width for node in nodes))
+        self.height = array.array("d", (node.height for node in nodes))
+
+        # Edge columns: index 0 is the exit Port, index 1 the entry Port
+        self.port_x = [array.array("d", (e.ports[i].pos[0] if e.ports[i].pos else math.nan for e in self.edges)) for i in (0, 1)]
+        self.port_y = [array.array("d", (e.ports[i].pos[1] if e.ports[i].pos else math.nan for e in self.edges)) for i in (0, 1)]
+        self.port_area = [array.array("d", (e.ports[i].area for e in self.edges)) for i in (0, 1)]
+
+        self.out_ptr, self.out_edges = self.csr(len(nodes), self.src)
+        self.in_ptr, self.in_edges = self.csr(len(nodes), self.dst)
+
+    @classmethod
+    def build(cls, items: list[Node | Edge]) -> Graph:
+        return cls([i for i in items if isinstance(i, Node)], [i for i in items if isinstance(i, Edge)])
+
+    @staticmethod
+    def csr(size: int, keys: array.array) -> tuple[array.array, array.array]:
+        "Compressed sparse rows of item indices grouped by key."
+        ptr = array.array("q", bytes(8 * (size + 1)))
+        for key in keys:
+            if key >= 0:
+                ptr[key + 1] += 1
+        for n in range(size):
+            ptr[n + 1] += ptr[n]
+
+        fill = ptr[:-1]
+        rows = array.array("q", bytes(8 * ptr[-1]))
+        for n, key in enumerate(keys):
+            if key >= 0:
+                rows[fill[key]] = n
+                fill[key] += 1
+        return ptr, rows
+
+    def pairs(self) -> Generator[tuple[int, int]]:
+        "Indices of the Nodes at either end of each Edge which joins two Nodes of the Graph."
+        for src, dst in zip(self.src, self.dst):
+            if src >= 0 and dst >= 0:
+                yield src, dst
+
+    def exits(self, n: int) -> array.array:
+        "Indices of the Edges which leave Node n."
+        return self.out_edges[self.out_ptr[n]:self.out_ptr[n + 1]]
+
+    def entries(self, n: int) -> array.array:
+        "Indices of the Edges which enter Node n."
+        return self.in_edges[self.in_ptr[n]:self.in_ptr[n + 1]]
+
+    def out_degree(self, n: int) -> int:
+        return self.out_ptr[n + 1] - self.out_ptr[n]
+
+    def in_degree(self, n: int) -> int:
+        return self.in_ptr[n + 1] - self.in_ptr[n]
+
+    @property
+    def initial(self) -> list[Node]:
+        return [node for n, node in enumerate(self.nodes) if self.out_degree(n) and not self.in_degree(n)]
+
+    @property
+    def terminal(self) -> list[Node]:
+        return [node for n, node in enumerate(self.nodes) if self.in_degree(n) and not self.out_degree(n)]
+
+    def reachable(self, *starts: int) -> set[int]:
+        "Indices of all Nodes which can be reached from the start Nodes."
+        rv = set(starts)
+        work = list(starts)
+        while work:
+            n = work.pop()
+            for e in self.exits(n):
+                if (m := self.dst[e]) >= 0 and m not in rv:
+                    rv.add(m)
+                    work.append(m)
+        return rv
+
+    def extent(self) -> tuple[Coordinates]:
+        x_vals = [i for col in (self.x, *self.port_x) for i in col if not math.isnan(i)] or [0]
+        y_vals = [i for col in (self.y, *self.port_y) for i in col if not math.isnan(i)] or [0]
+        return Coordinates(min(x_vals), min(y_vals)), Coordinates(max(x_vals), max(y_vals))
+
+    def layers(self) -> dict[int, list[int]]:
+        "Indices of Nodes grouped by zone, in order of zone."
+        rv = defaultdict(list)
+        for n in sorted(range(len(self.nodes)), key=self.zone.__getitem__):
+            rv[self.zone[n]].append(n)
+        return rv
+
+    def port_sizes(self) -> tuple[list[list[float]], list[list[float]]]:
+        "Sizes of the entry and exit Ports of each Node."
+        return (
+            [[math.sqrt(self.port_area[1][e]) for e in self.entries(n)] for n in range(len(self.nodes))],
+            [[math.sqrt(self.port_area[0][e]) for e in self.exits(n)] for n in range(len(self.nodes))],
+        )
+
+    def place(self, boundary: tuple) -> Generator[tuple[int, list[Node]]]:
+        "Allocate positions to Nodes and Ports in columns by zone. See Plotter.place_items."
+        zones = self.layers()
+        lhs_sizes, rhs_sizes = self.port_sizes()
+        sizes = [
+            max(sum(lhs_sizes[n]), sum(rhs_sizes[n]), math.sqrt(self.area[n]))
+            for n in range(len(self.nodes))
+        ]
+
+        span = (boundary[2] - boundary[0])[1]
+        offset_x = 0
+        for zone, group in zones.items():
+            width_x = 0
+            space_y = (span - sum(sizes[n] for n in group)) / (2 * len(group) + 1)
+            for i, n in enumerate(group):
+                lhs, rhs = sum(lhs_sizes[n]), sum(rhs_sizes[n])
+                self.height[n] = max(lhs, rhs)
+                self.width[n] = max(self.height[n], math.sqrt(self.area[n]))
+                width_x = max(width_x, self.width[n])
+                self.x[n] = boundary[0][0] + offset_x + self.width[n] / 2
+                self.y[n] = boundary[0][1] + i * space_y + self.height[n] / 2
+
+                for end, edges, sizes_, total, dx in (
+                    (1, self.entries(n), lhs_sizes[n], lhs, -self.width[n] / 2),
+                    (0, self.exits(n), rhs_sizes[n], rhs, self.width[n] / 2),
+                ):
+                    y = self.y[n] - total / 2 - (sizes_[0] / 2 if sizes_ else 0)
+                    for e, size in zip(edges, sizes_):
+                        y += size
+                        self.port_x[end][e] = self.x[n] + dx
+                        self.port_y[end][e] = y
+
+            yield zone, [self.nodes[n] for n in group]
+            offset_x += 3 * width_x
+
+    def write(self):
+        "Write positions and sizes back to the Nodes and Edges."
+        for n, node in enumerate(self.nodes):
+            if not math.isnan(self.x[n]):
+                node.pos = Coordinates(self.x[n], self.y[n])
+            node.width = self.width[n]
+            node.height = self.height[n]
+        for e, edge in enumerate(self.edges):
+            for end in (0, 1):
+                if not math.isnan(self.port_x[end][e]):
+                    edge.ports[end].pos = Coordinates(self.port_x[end][e], self.port_y[end][e])
 
 
 class Board:
@@ -313,17 +823,39 @@ class Board:
     @classmethod
     def build(cls, data: dict) -> Board:
         body = data.get("board", {})
-        nodes = [Node.build(**item) for item in body.get("nodes", [])]
-        edges = [Edge.build(**item) for item in body.get("edges", [])]
-        return cls(items=nodes + edges, **body)
+        rv = cls(**body)
+        with rv:
+            nodes = [Node.build(**item) for item in body.get("nodes", [])]
+            edges = [Edge.build(**item) for item in body.get("edges", [])]
+        rv.extend(nodes + edges)
+        return rv
 
     def __init__(self, title: str = "", items: list = None, **kwargs):
         self.title = title
         self.shapes = dict()
-        self.items = items or list()
+        self.store = Registry()
+        self.context = list()
+        self.items = list()
+        self.extend(items or [])
+
+    def __enter__(self):
+        "Make this Board's Registry the one in which new Items are created."
+        self.context.append(Registry.active.set(self.store))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        Registry.active.reset(self.context.pop())
+        return False
+
+    def extend(self, items: list):
+        self.store.adopt(items)
+        self.items.extend(items)
 
     @staticmethod
-    def extent(items: list) -> tuple[Coordinates]:
+    def extent(items: list | Graph) -> tuple[Coordinates]:
+        if isinstance(items, Graph):
+            return items.extent()
+
         nodes = [i for i in items if isinstance(i, Node)]
         x_vals = sorted([p.pos[0] for node in nodes for p in [node] + list(node.ports.values()) if p.pos]) or [0]
         y_vals = sorted([p.pos[1] for node in nodes for p in [node] + list(node.ports.values()) if p.pos]) or [0]
@@ -373,8 +905,9 @@ class Board:
 
     @staticmethod
     def position_node_ports(node: Node):
-        lhs_edges = {edge: math.sqrt(edge.ports[1].area) for edge in node.edges if node.uid in edge.ports[1].joins}
-        rhs_edges = {edge: math.sqrt(edge.ports[0].area) for edge in node.edges if node.uid in edge.ports[0].joins}
+        i_edges, x_edges = node.connections
+        lhs_edges = {edge: math.sqrt(edge.ports[1].area) for edge in i_edges}
+        rhs_edges = {edge: math.sqrt(edge.ports[0].area) for edge in x_edges}
 
         height = max(sum(lhs_edges.values()), sum(rhs_edges.values()))
         width = max(height, math.sqrt(node.area))
@@ -394,53 +927,55 @@ class Board:
 
     @property
     def initial(self) -> list[Node]:
-        survey = defaultdict(set)
-        for item in self.items:
-            for n, port in enumerate(item.ports):
-                try:
-                    survey[n].update({node for uid in port.joins if isinstance(node := item.store.get(uid), Node)})
-                except AttributeError:
-                    assert isinstance(item, Node)
-
-        return list(survey.get(0, set()).difference(survey.get(1, set())))
+        self.store.purge()
+        return [node for uid in self.store.initial if isinstance(node := self.store.get(uid), Node)]
 
     @property
     def terminal(self) -> list[Node]:
-        survey = defaultdict(set)
-        for item in self.items:
-            for n, port in enumerate(item.ports):
-                try:
-                    survey[n].update({node for uid in port.joins if isinstance(node := item.store.get(uid), Node)})
-                except AttributeError:
-                    assert isinstance(item, Node)
+        self.store.purge()
+        return [node for uid in self.store.terminal if isinstance(node := self.store.get(uid), Node)]
 
-        return list(survey.get(1, set()).difference(survey.get(0, set())))
+    @staticmethod
+    def svg_node(elem: ET.Element) -> Node:
+        "Make a Node from an Inkscape shape."
+        attrib = elem.attrib
+        desc = elem.findtext("{*}desc")
+        return Node(
+            id=int(''.join(i for i in attrib.get("id") if i.isdigit())),
+            area=Decimal(attrib.get("width")) * Decimal(attrib.get("height")),
+            pos=Coordinates(attrib.get("x"), attrib.get("y"), coerce=float),
+            label=elem.findtext("{*}title"),
+            contents=[desc],
+            title=desc and desc.splitlines()[0].title(),
+        )
 
     def merge_svg(self, root: ET) -> dict:
         "Merge from Inkscape format."
+        # One pass to index the document, so each connector finds its ends directly
+        elements = {id_: elem for elem in root.iter() if (id_ := elem.get("id"))}
+        connectors = root.iterfind(".//*[@inkscape:connector-type]", namespaces=vars(NAMESPACE))
+        return self.join_svg(elements, connectors)
+
+    def join_svg(self, elements: dict[str, ET.Element], connectors: Iterable[ET.Element]) -> list:
+        "Make Nodes from the shapes which connectors join, and Edges from the connectors."
+        start = ET.QName(NAMESPACE.inkscape, "connection-start").text
+        end = ET.QName(NAMESPACE.inkscape, "connection-end").text
         edges = []
         nodes = {}
-        for edge_elem in root.findall(".//*[@inkscape:connector-type]", namespaces=vars(NAMESPACE)):
-            node_id_start = edge_elem.attrib[ET.QName(NAMESPACE.inkscape, "connection-start")].lstrip("#")
-            node_id_end = edge_elem.attrib[ET.QName(NAMESPACE.inkscape, "connection-end")].lstrip("#")
-            joins = [
-                nodes.setdefault(id_, Node(
-                    id=int(''.join(i for i in attrib.get("id") if i.isdigit())),
-                    area=Decimal(attrib.get("width")) * Decimal(attrib.get("height")),
-                    pos=Coordinates(attrib.get("x"), attrib.get("y"), coerce=float),
-                    label=elem.findtext("{*}title"),
-                    contents=[desc := elem.findtext("{*}desc")],
-                    title=desc and desc.splitlines()[0].title(),
-                ))
-                for id_ in (node_id_start, node_id_end)
-                if (elem := root.find(f".//*[@id='{id_}']")) is not None
-                and (attrib := elem.attrib)
-            ]
+        for edge_elem in connectors:
+            joins = []
+            for id_ in (edge_elem.attrib[start].lstrip("#"), edge_elem.attrib[end].lstrip("#")):
+                if id_ not in nodes and (elem := elements.get(id_)) is not None:
+                    nodes[id_] = self.svg_node(elem)
+                if id_ in nodes:
+                    joins.append(nodes[id_])
+
+            desc = edge_elem.findtext("{*}desc")
             edges.append(joins[0].connect(
                 joins[1],
                 id=int(''.join(i for i in edge_elem.attrib.get("id") if i.isdigit())),
                 label=edge_elem.findtext("{*}title"),
-                contents=[desc := edge_elem.findtext("{*}desc")],
+                contents=[desc],
                 title=desc and desc.splitlines()[0].title(),
             ))
 
@@ -448,38 +983,104 @@ class Board:
             self.position_node_ports(node)
 
         rv = list(nodes.values()) + edges
-        self.items.extend(rv)
+        self.extend(rv)
         return rv
 
     def merge_xml(self, root: ET) -> dict:
         "Merge from Dunnart format."
-        items = [i.attrib for i in root.findall("dunnart:node[@type!='guideline']", namespaces=vars(NAMESPACE))]
-        nodes = {
-            int(n["id"]): Node(
-                id=int(n.pop("id")),
-                area=n.pop("width") * n.pop("height"),
-                pos=(n.pop("cx"), n.pop("cy")),
-                **n
-            )
-            for n in (
-                dict(
+        return self.join_xml(
+            i.attrib for i in root.findall("dunnart:node[@type!='guideline']", namespaces=vars(NAMESPACE))
+        )
+
+    def join_xml(self, items: Iterable[dict]) -> list:
+        "Make Nodes from Dunnart shapes as they arrive. Connectors are joined at the end."
+        nodes = {}
+        connectors = []
+        for i in items:
+            if i.get("type") == "guideline":
+                continue
+            elif i.get("type") == "connector":
+                connectors.append(dict((a, int(i[a])) for a in ("id", "srcID", "dstID")))
+            else:
+                n = dict(
                     (a, i.get(a) if a in ("id", "label") else Decimal(i[a]))
                     for a in ("id", "width", "height", "label", "cx", "cy")
                 )
-                for i in items if i.get("type") != "connector"
-            )
-        }
-        edges = [
-            nodes[e.pop("srcID")].connect(nodes[e.pop("dstID")], **e)
-            for e in (
-                dict((a, int(i[a])) for a in ("id", "srcID", "dstID"))
-                for i in items if i.get("type") == "connector"
-            )
-        ]
+                id_ = int(n.pop("id"))
+                nodes[id_] = Node(
+                    id=id_,
+                    area=n.pop("width") * n.pop("height"),
+                    pos=(n.pop("cx"), n.pop("cy")),
+                    **n
+                )
+
+        edges = [nodes[e.pop("srcID")].connect(nodes[e.pop("dstID")], **e) for e in connectors]
         rv = list(nodes.values()) + edges
-        self.items.extend(rv)
+        self.extend(rv)
         return rv
 
+    def merge_stream(self, source) -> list:
+        "Merge from a file of either format, keeping in memory only the elements which make Nodes and Edges."
+        dunnart_node = ET.QName(NAMESPACE.dunnart, "node").text
+        docname = ET.QName(NAMESPACE.sodipodi, "docname").text
+        connector_type = ET.QName(NAMESPACE.inkscape, "connector-type").text
+        keep = {ET.QName(NAMESPACE.svg, "title").text, ET.QName(NAMESPACE.svg, "desc").text}
+
+        svg_like = None
+        shapes = {}
+        connectors = []
+        parents = []
+        events = ET.iterparse(source, events=("start", "end"))
+
+        def dunnart_nodes():
+            for event, elem in events:
+                if event == "start":
+                    parents.append(elem)
+                    continue
+
+                parents.pop()
+                if len(parents) == 1 and elem.tag == dunnart_node:
+                    yield dict(elem.attrib)
+                if parents:
+                    parents[-1].remove(elem)
+
+        for event, elem in events:
+            parents.append(elem)
+            svg_like = bool(elem.get(docname))
+            break
+
+        if not svg_like:
+            return self.join_xml(dunnart_nodes())
+
+        for event, elem in events:
+            if event == "start":
+                parents.append(elem)
+                continue
+
+            parents.pop()
+            if elem.tag in keep:
+                # Needed by its parent
+                continue
+
+            if elem.get(connector_type) is not None:
+                connectors.append(elem)
+            elif elem.get("id") and None not in (elem.get("width"), elem.get("height")):
+                shapes[elem.get("id")] = elem
+            else:
+                elem.clear()
+                if parents:
+                    parents[-1].remove(elem)
+                continue
+
+            # Detach what is kept, leaving only its title and description
+            for child in list(elem):
+                if child.tag not in keep:
+                    elem.remove(child)
+            if parents:
+                parents[-1].remove(elem)
+
+        return self.join_svg(shapes, connectors)
+
     def merge(self, root: ET) -> dict:
         svg_like = bool(root.attrib.get(ET.QName(NAMESPACE.sodipodi, "docname")))
         if svg_like:
@@ -487,10 +1088,43 @@ class Board:
         else:
             return self.merge_xml(root)
 
+    @staticmethod
+    def write(lines: Iterable[str], stream, size: int = 65536, encoding: str = "utf-8") -> int:
+        """
+        Write lines to a text or binary stream as they are made, in chunks of about `size` characters.
+        Lines are separated as by "\\n".join. Return the number of characters written.
+
+        """
+        binary = isinstance(stream, (io.RawIOBase, io.BufferedIOBase)) or "b" in getattr(stream, "mode", "")
+        chunk = []
+        length = 0
+        rv = 0
+        for n, line in enumerate(lines):
+            if n:
+                chunk.append("\n")
+                length += 1
+            chunk.append(line)
+            length += len(line)
+            if length >= size:
+                text = "".join(chunk)
+                stream.write(text.encode(encoding) if binary else text)
+                rv += length
+                chunk.clear()
+                length = 0
+
+        text = "".join(chunk)
+        stream.write(text.encode(encoding) if binary else text)
+        stream.flush()
+        return rv + length
+
+    def dump(self, stream, mode: str = "toml", **kwargs) -> int:
+        "Write the Board to a stream in TOML, SVG or XML format."
+        return self.write(getattr(self, mode)(**kwargs), stream)
+
     def toml(self) -> Generator[str]:
         yield "[board]"
         yield "[board.shapes]"
-        yield from (f'"{key}" = {[list(pos) for pos in val._data]}' for key, val in self.shapes.items())
+        yield from (f'"{key}" = {[list(pos) for pos in val.data]}' for key, val in self.shapes.items())
         yield ""
         for item in self.items:
             if isinstance(item, Node):
@@ -514,7 +1148,7 @@ class Board:
 
         defs = [
             '<polygon id="{0}" points="{1}" />'.format(
-                id_, " ".join(f"{pos[0]},{pos[1]}" for pos in shape._data)
+                id_, " ".join(f"{pos[0]},{pos[1]}" for pos in shape.data)
             )
             for id_, shape in self.shapes.items()
         ]
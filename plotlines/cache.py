@@ -0,0 +1,149 @@
+#! /usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of Plotlines.
+
+# Plotlines is free software: You can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+
+# Plotlines is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the
+# GNU General Public License along with Plotlines.
+# If not, see <https://www.gnu.org/licenses/>.
+
+from __future__ import annotations  # Until Python 3.14 is everywhere
+
+import hashlib
+import logging
+import os
+import pathlib
+import tempfile
+import typing
+
+import plotlines
+from plotlines.board import Board
+from plotlines.snapshot import Snapshot
+
+
+class Cache:
+    """
+    Built Boards kept on disk as snapshots, keyed by a hash of their source.
+
+    The key covers the source bytes, its file type and the version of Plotlines,
+    so a new release never loads a snapshot written by an old one.
+    When the cache grows past its limit, the least recently used entries go first.
+
+    """
+
+    suffix = ".snap"
+    block = 1 << 16
+
+    @staticmethod
+    def default_path() -> pathlib.Path:
+        base = os.environ.get("XDG_CACHE_HOME") or pathlib.Path.home().joinpath(".cache")
+        return pathlib.Path(base).joinpath("plotlines")
+
+    def __init__(self, path: pathlib.Path = None, limit: int = 64 * 1024 * 1024):
+        self.path = pathlib.Path(path or self.default_path())
+        self.limit = limit
+        self.logger = logging.getLogger("plotlines.cache")
+
+    @classmethod
+    def key(cls, source: bytes | typing.BinaryIO, kind: str = "") -> str:
+        "Hash the source, which is either bytes or a binary file read in blocks."
+        digest = hashlib.sha256()
+        for chunk in (plotlines.__version__.encode("ascii"), kind.encode("utf-8")):
+            digest.update(len(chunk).to_bytes(8, "little"))
+            digest.update(chunk)
+
+        if isinstance(source, bytes):
+            digest.update(source)
+        else:
+            while chunk := source.read(cls.block):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def entry(self, key: str) -> pathlib.Path:
+        return self.path.joinpath(key).with_suffix(self.suffix)
+
+    def get(self, key: str) -> Board | None:
+        path = self.entry(key)
+        try:
+            with path.open("rb") as source:
+                rv = Snapshot.load(source)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, IndexError) as error:
+            self.logger.warning(f"Discarding cache entry {path.name}: {error}")
+            path.unlink(missing_ok=True)
+            return None
+
+        # Mark the entry as recently used
+        path.touch()
+        return rv
+
+    def put(self, key: str, board: Board) -> pathlib.Path:
+        self.path.mkdir(parents=True, exist_ok=True)
+        path = self.entry(key)
+
+        # Write then rename, so a reader never sees half an entry
+        fd, name = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as output:
+                Snapshot.build(board).dump(output)
+            os.replace(name, path)
+        except BaseException:
+            pathlib.Path(name).unlink(missing_ok=True)
+            raise
+
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep: pathlib.Path = None) -> list[pathlib.Path]:
+        "Delete the least recently used entries until the cache fits its limit."
+        entries = []
+        for path in self.path.glob("*" + self.suffix):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        rv = []
+        for _, size, path in sorted(entries):
+            if total <= self.limit:
+                break
+            if path == keep:
+                continue
+            path.unlink(missing_ok=True)
+            total -= size
+            rv.append(path)
+        return rv
+
+    def load(self, path: pathlib.Path, build) -> Board:
+        """
+        Return the Board for a source file, calling `build(path)`
+        only when the cache has no entry for its contents.
+
+        """
+        with path.open("rb") as source:
+            key = self.key(source, path.suffix.lower())
+        rv = self.get(key)
+        if rv is not None:
+            self.logger.debug(f"Cache hit for {path.name}")
+            return rv
+
+        rv = build(path)
+        if rv is not None:
+            try:
+                self.put(key, rv)
+            except OSError as error:
+                self.logger.warning(f"Unable to cache {path.name}: {error}")
+        return rv
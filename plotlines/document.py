@@ -0,0 +1,231 @@
+#! /usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of Plotlines.
+
+# Plotlines is free software: You can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+
+# Plotlines is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the
+# GNU General Public License along with Plotlines.
+# If not, see <https://www.gnu.org/licenses/>.
+
+from __future__ import annotations  # Until Python 3.14 is everywhere
+
+import tomllib
+
+from plotlines.board import Board
+from plotlines.board import Edge
+from plotlines.board import Item
+from plotlines.board import Node
+from plotlines.layout import Shape
+
+
+class Document:
+    """
+    A TOML file together with the Board built from it.
+
+    The text is kept as chunks: the head of the file, then one chunk for each
+    `[[board.nodes]]` or `[[board.edges]]` table. Saving regenerates only the chunks of
+    Items which the Board's Registry marks as unsaved, and leaves the rest of the text as it was.
+
+    Edits which do not pass through the Registry, such as a change of label,
+    should be marked with `board.store.touch(item.uid)`.
+
+    """
+
+    headers = {"[[board.nodes]]": Node, "[[board.edges]]": Edge}
+
+    @classmethod
+    def loads(cls, text: str) -> Document:
+        data = tomllib.loads(text)
+        board = Board.build(data)
+        board.shapes.update(cls.build_shapes(data.get("board", {})))
+        return cls(board, text)
+
+    def __init__(self, board: Board, text: str):
+        self.board = board
+        self.chunks, self.kinds = self.divide(text)
+
+        # Board.build makes the Nodes first, then the Edges, each in the order of the file
+        items = [i for i in board.items if isinstance(i, Node)] + [i for i in board.items if isinstance(i, Edge)]
+        order = sorted(range(1, len(self.chunks)), key=lambda n: self.kinds[n] is Edge)
+        self.index = {items[k].uid: n for k, n in enumerate(order)}
+        self.shapes = dict(board.shapes)
+        board.store.unsaved.clear()
+
+    @classmethod
+    def divide(cls, text: str) -> tuple[list[str], list[type]]:
+        "Cut text into chunks at each table of Nodes or Edges, and note the kind of each."
+        chunks = [""]
+        kinds = [None]
+        for line in text.splitlines(keepends=True):
+            kind = cls.headers.get(line.strip())
+            if kind is not None:
+                chunks.append("")
+                kinds.append(kind)
+            chunks[-1] += line
+        return chunks, kinds
+
+    @staticmethod
+    def build_shapes(data: dict) -> dict[str, Shape]:
+        "Make the Shapes of the `[board.shapes]` table."
+        return {key: Shape(key, tuple(tuple(pos) for pos in val)) for key, val in data.get("shapes", {}).items()}
+
+    @staticmethod
+    def split(chunk: str) -> tuple[str, str]:
+        "Separate the body of a chunk from the blank lines which follow it."
+        body = chunk.rstrip()
+        return body, chunk[len(body):]
+
+    @staticmethod
+    def block(item: Node | Edge) -> str:
+        header = "[[board.nodes]]" if isinstance(item, Node) else "[[board.edges]]"
+        return "\n".join([header, *item.toml()])
+
+    def head(self) -> str:
+        lines = ["[board]", "[board.shapes]"]
+        lines.extend(f'"{key}" = {[list(pos) for pos in val.data]}' for key, val in self.board.shapes.items())
+        return "\n".join(lines)
+
+    def anchor(self, kind: type) -> int:
+        "The chunk after which a new Item of this kind belongs."
+        last = {}
+        for n in self.index.values():
+            last[self.kinds[n]] = max(n, last.get(self.kinds[n], 0))
+        if kind is Edge:
+            return last.get(Edge) or last.get(Node, 0)
+        return last.get(Node, 0)
+
+    def changes(self) -> list[Node | Edge]:
+        "The Items whose tables need writing again."
+        store = self.board.store
+        rv = {}
+        for uid in store.unsaved:
+            item = store.get(uid)
+            if isinstance(item, Node):
+                rv[item.uid] = item
+                # Moving a Node moves the ends of its Edges
+                rv.update({edge.uid: edge for edge in item.edges})
+            elif isinstance(item, Edge):
+                rv[item.uid] = item
+        return list(rv.values())
+
+    def dumps(self) -> str:
+        "Bring the text up to date with the Board and return it."
+        present = {item.uid for item in self.board.items}
+        for uid in [uid for uid in self.index if uid not in present]:
+            self.chunks[self.index.pop(uid)] = ""
+
+        if self.board.shapes != self.shapes:
+            body, tail = self.split(self.chunks[0])
+            self.chunks[0] = self.head() + (tail or "\n\n")
+            self.shapes = dict(self.board.shapes)
+
+        added = []
+        for item in self.changes():
+            if item.uid not in present:
+                continue
+            n = self.index.get(item.uid)
+            if n is None:
+                added.append(item)
+            else:
+                body, tail = self.split(self.chunks[n])
+                self.chunks[n] = self.block(item) + tail
+
+        # New Items go after the last of their kind, keeping the order of the Board
+        for item in sorted(added, key=lambda i: not isinstance(i, Node)):
+            n = self.anchor(type(item))
+            body, tail = self.split(self.chunks[n])
+            self.chunks[n] = body + "\n\n"
+            self.chunks.insert(n + 1, self.block(item) + (tail if tail.count("\n") >= 2 else "\n"))
+            self.kinds.insert(n + 1, type(item))
+            self.index = {uid: i + (i > n) for uid, i in self.index.items()}
+            self.index[item.uid] = n + 1
+
+        self.board.store.unsaved.clear()
+        return "".join(self.chunks)
+
+    def reload(self, text: str) -> list[Node | Edge]:
+        """
+        Bring the Board up to date with new text, parsing only the tables which have changed.
+
+        Items made from changed tables replace the old ones under the same uid, so
+        the adjacency of the Registry holds. Their Nodes are marked dirty for layout.
+        A changed head sets the title and shapes of the Board afresh.
+        Return the new Items.
+
+        """
+        board = self.board
+        store = board.store
+        chunks, kinds = self.divide(text)
+
+        # Tables are matched by their text, ignoring the blank lines after them
+        known = {self.split(self.chunks[n])[0]: uid for uid, n in self.index.items()}
+        index = {}
+        parsed = []
+        for n in range(1, len(chunks)):
+            uid = known.pop(self.split(chunks[n])[0], None)
+            if uid is None:
+                key = "nodes" if kinds[n] is Node else "edges"
+                parsed.append((n, tomllib.loads(chunks[n])["board"][key][0]))
+            else:
+                index[uid] = n
+
+        # What is left of the known tables were changed or deleted
+        fresh = {Item.key(data["uid"]) for n, data in parsed if "uid" in data}
+        stale = set(known.values())
+        for uid in stale:
+            old = store.get(uid)
+            if isinstance(old, Edge):
+                store.unlink(old)
+            elif isinstance(old, Node) and store.grid is not None:
+                for pin in [old] + list(old.ports.values()):
+                    store.grid.discard(pin.uid)
+            if uid not in fresh:
+                store.pop(uid, None)
+                store.forget(uid)
+
+        pending = dict(store.unsaved)
+        with board:
+            nodes = {n: Node.build(**data) for n, data in parsed if kinds[n] is Node}
+            edges = {n: Edge.build(**data) for n, data in parsed if kinds[n] is Edge}
+        built = list(nodes.values()) + list(edges.values())
+        if store.grid is not None:
+            for node in nodes.values():
+                store.grid.update(node)
+
+        # The text on disk now says what the new Items are
+        store.unsaved.clear()
+        store.unsaved.update({uid: None for uid in pending if uid not in stale})
+
+        made = nodes | edges
+        index.update({item.uid: n for n, item in made.items()})
+        items = {n: made[n] if n in made else store.get(uid) for uid, n in index.items()}
+        board.items[:] = (
+            [items[n] for n in sorted(items) if kinds[n] is Node] + [items[n] for n in sorted(items) if kinds[n] is Edge]
+        )
+
+        if self.split(chunks[0])[0] != self.split(self.chunks[0])[0]:
+            head = tomllib.loads(chunks[0]).get("board", {})
+            board.title = head.get("title", "")
+            board.shapes.clear()
+            board.shapes.update(self.build_shapes(head))
+            self.shapes = dict(board.shapes)
+
+        self.chunks, self.kinds, self.index = chunks, kinds, index
+        return built
+
+    def save(self, stream) -> int:
+        "Write the text to a stream, and return the number of characters written."
+        text = self.dumps()
+        stream.write(text)
+        stream.flush()
+        return len(text)
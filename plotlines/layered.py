@@ -0,0 +1,134 @@
+#! /usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of Plotlines.
+
+# Plotlines is free software: You can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+
+# Plotlines is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the
+# GNU General Public License along with Plotlines.
+# If not, see <https://www.gnu.org/licenses/>.
+
+from __future__ import annotations  # Until Python 3.14 is everywhere
+
+import math
+import statistics
+
+from plotlines.board import Graph
+
+
+class Layered:
+    """
+    Layered drawing of a Graph, after Sugiyama, Tagawa and Toda (1981).
+
+    Each zone is a layer. Sweeps back and forth across the layers reorder each one
+    by the median (or barycenter) rank of its neighbours in the layer before.
+    The ordering with fewest crossings is kept.
+
+    """
+
+    def __init__(self, graph: Graph, sweeps: int = 8, method: str = "median"):
+        self.graph = graph
+        self.sweeps = sweeps
+        self.method = {"median": statistics.median, "barycenter": statistics.fmean}[method]
+        self.record = []
+
+    def neighbours(self) -> list[list[int]]:
+        rv = [list() for _ in self.graph.nodes]
+        for src, dst in self.graph.pairs():
+            rv[src].append(dst)
+            rv[dst].append(src)
+        return rv
+
+    @staticmethod
+    def crossings(upper: list[int], lower: list[int], neighbours: list[list[int]]) -> int:
+        "Count crossings of the Edges between two adjacent layers."
+        rank = {n: r for r, n in enumerate(lower)}
+        ends = [r for i in upper for r in sorted(rank[j] for j in neighbours[i] if j in rank)]
+
+        # Count inversions with a Fenwick tree
+        tree = [0] * (len(lower) + 1)
+        rv = 0
+        for n, r in enumerate(ends):
+            i = r + 1
+            below = 0
+            while i > 0:
+                below += tree[i]
+                i -= i & -i
+            rv += n - below
+            i = r + 1
+            while i <= len(lower):
+                tree[i] += 1
+                i += i & -i
+        return rv
+
+    def reorder(self, layer: list[int], fixed: list[int], neighbours: list[list[int]]) -> list[int]:
+        rank = {n: r for r, n in enumerate(fixed)}
+        scale = len(fixed) / max(1, len(layer))
+
+        def key(item):
+            r, n = item
+            ranks = [rank[i] for i in neighbours[n] if i in rank]
+            return (self.method(ranks) if ranks else r * scale, r)
+
+        return [n for r, n in sorted(enumerate(layer), key=key)]
+
+    def order(self) -> list[list[int]]:
+        "Reduce crossings between adjacent layers."
+        neighbours = self.neighbours()
+        layers = list(self.graph.layers().values())
+
+        def total(layers):
+            return sum(self.crossings(a, b, neighbours) for a, b in zip(layers, layers[1:]))
+
+        best = [list(i) for i in layers]
+        fewest = total(best)
+        self.record.append(fewest)
+        for sweep in range(self.sweeps):
+            if not fewest:
+                break
+
+            indices = range(1, len(layers)) if sweep % 2 == 0 else range(len(layers) - 2, -1, -1)
+            step = -1 if sweep % 2 == 0 else 1
+            for n in indices:
+                layers[n] = self.reorder(layers[n], layers[n + step], neighbours)
+
+            count = total(layers)
+            self.record.append(count)
+            if count < fewest:
+                best = [list(i) for i in layers]
+                fewest = count
+        return best
+
+    def place(self, layers: list[list[int]]):
+        "Assign coordinates: one column per layer, Nodes stacked and centred within it."
+        lhs_sizes, rhs_sizes = self.graph.port_sizes()
+        for n, area in enumerate(self.graph.area):
+            self.graph.height[n] = max(sum(lhs_sizes[n]), sum(rhs_sizes[n]))
+            self.graph.width[n] = max(self.graph.height[n], math.sqrt(area))
+
+        gap = statistics.fmean(self.graph.width) if self.graph.nodes else 0
+        offset_x = 0
+        for layer in layers:
+            width_x = max((self.graph.width[n] for n in layer), default=0)
+            span = sum(self.graph.width[n] + gap for n in layer) - gap
+            y = -span / 2
+            for n in layer:
+                size = self.graph.width[n]
+                self.graph.x[n] = offset_x + width_x / 2
+                self.graph.y[n] = y + size / 2
+                y += size + gap
+            offset_x += 3 * width_x
+
+    def __call__(self) -> Graph:
+        "Lay out the Graph, leaving positions in its columns."
+        self.place(self.order())
+        return self.graph
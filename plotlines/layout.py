@@ -0,0 +1,405 @@
+#! /usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of Plotlines.
+
+# Plotlines is free software: You can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+
+# Plotlines is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the
+# GNU General Public License along with Plotlines.
+# If not, see <https://www.gnu.org/licenses/>.
+
+from __future__ import annotations  # Until Python 3.14 is everywhere
+
+from collections import Counter
+from collections import defaultdict
+from collections.abc import Generator
+import dataclasses
+from fractions import Fraction
+import importlib.resources
+import itertools
+import math
+import operator
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+from plotlines.board import Board
+from plotlines.board import Edge
+from plotlines.board import Graph
+from plotlines.board import Grid
+from plotlines.board import Node
+from plotlines.board import Registry
+from plotlines.coordinates import Coordinates as C
+from plotlines.layered import Layered
+from plotlines.motif import Motif
+from plotlines.multilevel import Multilevel
+from plotlines.spacing import Spacing
+from plotlines.stress import Stress
+
+
+@dataclasses.dataclass(frozen=True)
+class Shape:
+    "A polygon to represent a Node, independent of any means of drawing it."
+    key:    str
+    data:   tuple[tuple[float, float]]
+    type:   str = "polygon"
+
+
+@dataclasses.dataclass(frozen=True)
+class Iteration:
+    "The state of the board after a step of Layout.spread."
+    step:       int
+    elapsed:    float
+    crowding:   dict[int, float]
+    moved:      int
+
+
+class Layout:
+    "Computes positions and shapes for the items of a Board without any graphics."
+
+    size = (400, 300)
+    modes = dict(
+        zones="layout_board", layered="layout_layered", stress="layout_stress", multilevel="layout_multilevel"
+    )
+
+    def __init__(self, b: Board):
+        self.board = b
+        self.record = []
+        try:
+            self.words = self.build_words()
+        except Exception:
+            self.words = dict()
+
+    def build_shape(self, size, scale=1) -> Shape:
+        key = f"sq{size:.02f}x{size:.02f}-{scale}"
+        try:
+            return self.board.shapes[key]
+        except KeyError:
+            unit = float(scale * size / 2)
+            shape = Shape(
+                key, (
+                    (-unit, -unit),
+                    (unit, -unit),
+                    (unit, unit),
+                    (-unit, unit))
+            )
+            self.board.shapes[key] = shape
+            return shape
+
+    @staticmethod
+    def build_words() -> dict[int, list[str]]:
+        text = importlib.resources.read_text("plotlines", "assets/words.txt")
+        words = text.splitlines()
+        return words
+
+    @staticmethod
+    def build_graph(
+        limit: int,
+        ending: int,
+        exits: int = 2,
+        steps: int = sys.maxsize,
+        mode: str = "rtl",
+        builder: type = Motif,
+        **kwargs
+    ) -> Generator[Node | Edge]:
+
+        fwd = mode == "ltr"
+        trails = {} # A walk in G where no Edge is repeated
+        zones = defaultdict(list)
+        state = SimpleNamespace(step=0, spare=limit, zone=0 if fwd else limit, motif=builder())
+
+        endings = [f"ending_{i + 1:02d}" for i in range(ending)]
+        zones[state.zone].extend(Node(id=Registry.active.get().allocate(), label=i, zone=state.zone) for i in endings)
+        state.tally = Counter({Node: len(endings)})
+
+        # Items which the limit cuts off must live until the end, or their Nodes look like leaves again
+        made = []
+        while state.step < steps:
+            group = list(itertools.chain.from_iterable(zones.values()))
+            if state.step == 0:
+                yield from group
+
+            state.step += 1
+            state.ratio = Fraction(state.tally[Node] + state.tally[Edge], limit - exits)
+            made.append(
+                state.motif(
+                    group,
+                    ratio=state.ratio,
+                    exits=exits,
+                    zone=state.zone,
+                    fwd=fwd,
+                    **kwargs
+                )
+            )
+            for n, item in enumerate(made[-1]):
+
+                try:
+                    state.zone = max(state.zone, item.zone) if fwd else min(state.zone, item.zone)
+                except AttributeError:
+                    pass
+
+                item.id = item.id or item.store.allocate()
+                item.state = state
+                state.tally[type(item)] += 1
+                state.spare = limit - state.tally[Node] - state.tally[Edge]
+
+                zones[state.zone].append(item)
+                yield item
+
+                if state.spare <= 0:
+                    break
+
+    @staticmethod
+    def expandex(length: int):
+        "Generate indexes from the middle outwards"
+        mid = length // 2
+        up = range(mid, length)
+        dn = range(mid - 1, -1, -1)
+        for i, j in itertools.zip_longest(up, dn):
+            for x in (i, j):
+                if x is not None:
+                    yield x
+
+    @staticmethod
+    def place_items(items: list | Graph = None, boundary: tuple = None, visited=None):
+        visited = set() if visited is None else visited
+        if isinstance(items, Graph):
+            zones = list(items.place(boundary))
+            items.write()
+            for zone, nodes in zones:
+                visited.update(nodes)
+                visited.update(node.pos for node in nodes)
+                yield zone, nodes
+            return
+
+        work = list()
+        sizes = {item: Board.node_size(item) for item in items if isinstance(item, Node)}
+        zones = dict(
+            [
+                (key, list(group))
+                for key, group in itertools.groupby(
+                    sorted((item for item in items if isinstance(item, Node)), key=operator.attrgetter("zone")),
+                    key=operator.attrgetter("zone")
+                )
+            ]
+        )
+
+        offset_x = 0
+        width_x = 0
+        for zone, nodes in zones.items():
+            space_y = ((boundary[2] - boundary[0])[1] - sum(sizes[i] for i in nodes)) / (2 * len(nodes) + 1)
+            for n, node in enumerate(nodes):
+                i_edges, x_edges = node.connections
+                lhs_edges = {edge: math.sqrt(edge.ports[1].area) for edge in i_edges}
+                rhs_edges = {edge: math.sqrt(edge.ports[0].area) for edge in x_edges}
+                node.height = max(sum(lhs_edges.values()), sum(rhs_edges.values()))
+                node.width = max(node.height, math.sqrt(node.area))
+                width_x = max(width_x, node.width)
+
+                # Allocate coordinates from lhs of boundary
+                node.pos = C(
+                    boundary[0][0] + offset_x + node.width / 2,
+                    boundary[0][1] + n * space_y + node.height / 2,
+                )
+
+                visited.add(node)
+                visited.add(node.pos)
+
+                for n, (edge, size) in enumerate(lhs_edges.items()):
+                    if n == 0:
+                        pos = node.pos - C(node.width / 2, size / 2 + sum(lhs_edges.values()) / 2)
+                    pos += C(0, size)
+                    edge.ports[1].pos = pos
+                for n, (edge, size) in enumerate(rhs_edges.items()):
+                    if n == 0:
+                        pos = node.pos - C(node.width / -2, size / 2 + sum(rhs_edges.values()) / 2)
+                    pos += C(0, size)
+                    edge.ports[0].pos = pos
+            yield zone, nodes
+
+            edge_length = 2 * width_x
+            offset_x += width_x + edge_length
+            width_x = 0
+
+    @staticmethod
+    def crowding(zone: list[Node], grid: Grid = None) -> float:
+        "The least space between the Nodes of a zone and their neighbours and Edges. A Grid speeds the search."
+        others = [item for node in zone for item in node.nearby + node.edges]
+        return min(Spacing(zone, others, grid=grid).minimum(), sys.maxsize)
+
+    def layout_board(
+        self, size, threshold=0.1, limit: int = None, index: bool = True, budget: float = None, **kwargs
+    ) -> list[Iteration]:
+        """
+        Move Nodes apart in the most crowded zone until the median crowding of all zones
+        reaches `threshold`, or `limit` steps are done, or `budget` seconds have passed.
+
+        The positions left on the board are those of the least crowded step. Each step is
+        recorded as an Iteration in `self.record`, which is returned.
+
+        """
+        limit = limit or 2 * len(self.board.items)
+        boundary = [C(0, 0), C(0, size[0]), C(size[1], 0), C(*size)]
+        zones = dict(self.place_items(self.board.items, boundary=boundary))
+        rv = self.spread(zones, self.board.items, threshold=threshold, limit=limit, index=index, budget=budget)
+        self.board.store.dirty.clear()
+        return rv
+
+    def relayout(
+        self, size, threshold=0.1, limit: int = None, index: bool = True, budget: float = None, **kwargs
+    ) -> list:
+        """
+        Lay out again only the zones of Nodes which are dirty, and the zones of their neighbours.
+        Every other Node stays where it is.
+
+        """
+        store = self.board.store
+        dirty = [node for uid in store.dirty if isinstance(node := store.get(uid), Node)]
+        self.record = []
+        if not dirty:
+            return self.board.items
+
+        touched = {node.zone for node in dirty} | {other.zone for node in dirty for other in node.nearby}
+        nodes = [i for i in self.board.items if isinstance(i, Node)]
+        pinned = [i for i in nodes if i.pos is not None and i.zone not in touched]
+        zones = {
+            zone: [i for i in nodes if i.zone == zone]
+            for zone in sorted(touched)
+        }
+
+        for zone, group in zones.items():
+            column = [i for i in group if i.pos is not None and i.uid not in store.dirty]
+            before = [i for i in pinned if i.zone < zone]
+            if column:
+                left = min(i.pos[0] - i.width / 2 for i in column)
+            elif before:
+                width_x = max(i.width for i in before)
+                left = max(i.pos[0] + i.width / 2 for i in before) + 2 * width_x
+            else:
+                left = 0
+            boundary = [C(left, 0), C(left, size[0]), C(left + size[1], 0), C(left + size[1], size[0])]
+            list(self.place_items(group, boundary=boundary))
+            pinned.extend(group)
+
+        limit = limit or 2 * sum(len(i) for i in zones.values())
+        context = {
+            other.uid: other for group in zones.values() for node in group for other in [node] + node.nearby
+        }
+        self.spread(zones, context.values(), threshold=threshold, limit=limit, index=index, budget=budget)
+        store.dirty.clear()
+        return self.board.items
+
+    def spread(
+        self, zones: dict[int, list[Node]], context: list, threshold=0.1, limit: int = None,
+        index: bool = True, budget: float = None
+    ):
+        "Move Nodes apart within their zones. Crowding is measured against the items of `context`."
+        self.record = []
+
+        # Node.translate keeps the index up to date while the board is attached to it
+        grid = self.board.store.grid = Grid.build(context) if index else None
+        start = time.perf_counter()
+        best = (-math.inf, None)
+        try:
+            moved = 0
+            for step in itertools.count():
+                crowding = {z: self.crowding(zone, grid) for z, zone in zones.items()}
+                median = statistics.median(crowding.values()) if crowding else math.inf
+                elapsed = time.perf_counter() - start
+                self.record.append(Iteration(step, elapsed, crowding, moved))
+                if median > best[0]:
+                    best = (median, self.snapshot(zones))
+
+                if median >= threshold or step >= limit or (budget is not None and elapsed >= budget):
+                    break
+
+                crowded = {v: k for k, v in crowding.items()}.get(min(crowding.values()))
+                zone = zones[crowded]
+                for n, i in enumerate(self.expandex(len(zone))):
+                    node = zone[i]
+                    if n % 2 == 0:
+                        hop = node.height
+                    else:
+                        hop = -node.height
+                    node.translate(C(0, hop))
+                moved = len(zone)
+        finally:
+            self.board.store.grid = None
+
+        if median < best[0]:
+            self.restore(best[1])
+        return self.record
+
+    @staticmethod
+    def snapshot(zones: dict[int, list[Node]]) -> list[tuple]:
+        "Record the positions of Nodes and their Ports."
+        return [
+            (node, node.pos, [(port, port.pos) for port in node.ports.values()])
+            for zone in zones.values() for node in zone
+        ]
+
+    @staticmethod
+    def restore(snapshot: list[tuple]):
+        for node, pos, ports in snapshot:
+            node.pos = pos
+            for port, port_pos in ports:
+                port.pos = port_pos
+
+    def layout(self, size, mode: str = "zones", **kwargs) -> list:
+        "Lay out the board by one of the methods in `modes`, marking the Nodes it moves as unsaved."
+        method = getattr(self, self.modes[mode])
+        nodes = [i for i in self.board.items if isinstance(i, Node)]
+        before = [node.pos for node in nodes]
+        method(size, **kwargs)
+        self.board.store.unsaved.update(
+            dict.fromkeys(node.uid for node, pos in zip(nodes, before) if node.pos != pos)
+        )
+        return self.board.items
+
+    def layout_layered(self, size=None, **kwargs) -> list:
+        "Lay out the board in layers by zone, with fewest crossings between them."
+        graph = Layered(Graph.build(self.board.items), **kwargs)()
+        return self.write_graph(graph)
+
+    def layout_multilevel(self, size=None, **kwargs) -> list:
+        "Lay out a large board by refining the layout of successively finer versions of it."
+        kwargs.setdefault("length", self.board.xml_options.get("defaultIdealConnectorLength", 2))
+        graph = Multilevel(Graph.build(self.board.items), **kwargs)()
+        return self.write_graph(graph)
+
+    def layout_stress(self, size=None, **kwargs) -> list:
+        "Lay out the board by stress majorization, as configured by its xml_options."
+        graph = Stress.build(self.board, **kwargs)()
+        return self.write_graph(graph)
+
+    def write_graph(self, graph: Graph) -> list:
+        graph.write()
+        for node in graph.nodes:
+            self.board.position_node_ports(node)
+        return self.board.items
+
+    def style_items(self, items: list, size: tuple = None, **kwargs) -> tuple:
+        size = size or self.size
+        frame = self.board.frame(*self.board.extent(items), square=True)
+        if frame[0][0] == frame[1][0] or frame[0][1] == frame[1][1]:
+            frame = [C(0, 0), C(120, 120)]
+
+        scale = self.board.scale_factor(size, frame)
+
+        for item in items:
+            try:
+                size = max(getattr(item, "width", 0), getattr(item, "height", 0)) or math.sqrt(item.area)
+                item.shape = self.build_shape(size=size, scale=scale).key
+            except AttributeError:
+                assert isinstance(item, Edge)
+        return frame, scale
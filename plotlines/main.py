@@ -19,6 +19,7 @@
 
 import argparse
 import datetime
+import functools
 import importlib.resources
 import logging
 import pathlib
@@ -27,16 +28,23 @@ import re
 import shutil
 import sys
 import tomllib
-import turtle
-import xml.etree.ElementTree as ET
 
 import plotlines
 from plotlines.board import Board
 from plotlines.board import Edge
 from plotlines.board import Node
-from plotlines.plotter import Plotter
+from plotlines.cache import Cache
+from plotlines.layout import Layout
+from plotlines.snapshot import Mapped
+from plotlines.snapshot import Snapshot
 from plotlines.tree import Tree
 
+try:
+    from plotlines.plotter import Plotter
+except ImportError:
+    # No Tk available
+    Plotter = None
+
 
 def setup_logger(level=logging.INFO):
     logging.basicConfig(level=level)
@@ -50,6 +58,25 @@ def setup_logger(level=logging.INFO):
         )
 
 
+def build_board(path: pathlib.Path, logger: logging.Logger) -> Board | None:
+    if path.suffix == ".toml":
+        text = path.read_text(encoding="utf-8")
+        try:
+            data = tomllib.loads(text)
+        except tomllib.TOMLDecodeError as error:
+            detail = format(error).splitlines()[-1]
+            n = int(re.compile(r"(?<=line )(\d+)").search(detail).group(0))
+            logger.warning(detail)
+            logger.warning(f"{n}: " + text.splitlines()[n-1])
+            return None
+        else:
+            return Board.build(data)
+    else:
+        with Board() as board:
+            board.merge_stream(path)
+        return board
+
+
 def main(args):
     level = logging.DEBUG if args.debug else logging.INFO
     setup_logger(level=level)
@@ -57,52 +84,68 @@ def main(args):
 
     logger.debug(f"{args=}")
 
+    if args.output:
+        if format(args.output).startswith(".") and format(args.output).count(".") == 1:
+            mode = format(args.output).split(".")[-1].lower()
+        elif args.output.suffix.lower() == ".snap":
+            mode = "snap"
+        else:
+            mode = "spiki"
+    else:
+        mode = "plot"
+
     if args.input:
         width, height = None, None
-        text = args.input.read_text()
-        if args.input.suffix == ".toml":
-            try:
-                data = tomllib.loads(text)
-            except tomllib.TOMLDecodeError as error:
-                detail = format(error).splitlines()[-1]
-                n = int(re.compile(r"(?<=line )(\d+)").search(detail).group(0))
-                logger.warning(detail)
-                logger.warning(f"{n}: " + text.splitlines()[n-1])
-                return 1
+        if args.input.suffix in (".svg", ".toml", ".xml"):
+            build = functools.partial(build_board, logger=logger)
+            if args.no_cache:
+                board = build(args.input)
             else:
-                board = Board.build(data)
-        elif args.input.suffix in (".svg", ".xml"):
-            root = ET.fromstring(text)
-            board = Board()
-            items = board.merge(root)
+                board = Cache(args.cache).load(args.input, build)
+            if board is None:
+                return 1
+            items = list(board.items)
+        elif args.input.suffix == ".snap" and mode == "spiki" and not args.layout:
+            # Export reads the file lazily, and it is closed once written
+            with Mapped(args.input) as board:
+                return write_output(board, list(board.items), mode, args, logger)
+        elif args.input.suffix == ".snap":
+            with args.input.open("rb") as source:
+                board = Snapshot.load(source)
+            items = list(board.items)
+
+        if args.layout:
+            layout = Layout(board)
+            items = layout.layout(layout.size, mode=args.layout)
     else:
         items = []
         steps = args.limit // 10
         try:
-            items = list(Plotter.build_graph(steps=steps, **vars(args)))
+            with Board() as board:
+                items = list(Layout.build_graph(steps=steps, **vars(args)))
         except KeyboardInterrupt:
             return 0
         else:
-            board = Board(items=items)
-            plotter = Plotter(board, t=turtle.Turtle())
-            size = plotter.turtle.screen.screensize()
-            items = plotter.layout_board(size)
-            frame, scale = plotter.style_items(board.items, size=size)
-            items = plotter.draw_items(items, debug=args.debug, delay=0)
+            board.extend(items)
+            layout = Layout(board)
+            items = layout.layout(layout.size, mode=args.layout or "zones")
+            frame, scale = layout.style_items(board.items, size=layout.size)
             width = frame[1][0] - frame[0][0]
             height = frame[1][1] - frame[0][1]
 
-    if args.output:
-        if format(args.output).startswith(".") and format(args.output).count(".") == 1:
-            mode = format(args.output).split(".")[-1].lower()
-        else:
-            mode = "spiki"
-    else:
-        mode = "plot"
+    return write_output(board, items, mode, args, logger, width=width, height=height)
+
 
+def write_output(
+    board: Board | Mapped, items: list, mode: str, args, logger: logging.Logger, width=None, height=None
+) -> int:
     logger.info(f"Format option: {mode.upper()}")
     if mode == "plot":
-        plotter = Plotter(board, t=turtle.Turtle())
+        if Plotter is None:
+            logger.warning("Plotting needs turtle graphics, which are not available")
+            return 1
+
+        plotter = Plotter(board)
         size = plotter.turtle.screen.screensize()
         frame, scale = plotter.style_items(board.items, size=size)
         items = plotter.draw_items(items, debug=args.debug, delay=0)
@@ -113,16 +156,35 @@ def main(args):
     if mode == "spiki":
         try:
             parent = args.output.resolve()
-            if parent.exists():
+            if parent.exists() and not args.incremental:
                 shutil.rmtree(parent)
             parent.mkdir(parents=True, exist_ok=True)
         except Exception as error:
             logger.warning(format(error), exc_info=error)
             return 1
         tree = Tree(board)
-        for text, path in tree(parent):
-            path.write_text(text)
-            logger.info(f"Wrote {path}")
+        if args.incremental:
+            outcomes = tree.sync(parent)
+        else:
+            outcomes = tree.emit(parent)
+        for path, outcome in outcomes.items():
+            if isinstance(outcome, Exception):
+                logger.warning(f"Failed to write {path}: {outcome}")
+            elif outcome == "written":
+                logger.info(f"Wrote {path}")
+        counts = Tree.tally(outcomes)
+        logger.info(", ".join(f"{v} {k}" for k, v in counts.items()))
+        if counts["failed"]:
+            return 1
+        logger.info(f"{mode.upper()} output complete")
+        return 0
+    elif mode == "snap":
+        snapshot = Snapshot.build(board)
+        if format(args.output).startswith("."):
+            snapshot.dump(sys.stdout.buffer)
+        else:
+            with args.output.open("wb") as output:
+                snapshot.dump(output)
         logger.info(f"{mode.upper()} output complete")
         return 0
     elif mode == "svg":
@@ -134,9 +196,11 @@ def main(args):
     else:
         lines = board.xml(width=width, height=height)
 
-    write = args.output.write_text if args.output else sys.stdout.write
-    write = sys.stdout.write if format(args.output).startswith(".") else args.output.write_text
-    write("\n".join(lines))
+    if format(args.output).startswith("."):
+        Board.write(lines, sys.stdout)
+    else:
+        with args.output.open("w") as output:
+            Board.write(lines, output)
     logger.info(f"{mode.upper()} output complete")
     return 0
 
@@ -164,6 +228,19 @@ def parser():
         "--exits", type=int, default=4,
         help="Fix the number of exiting Edges from each Node [4]"
     )
+    rv.add_argument(
+        "--layout", choices=list(Layout.modes), default=None,
+        help="Choose a layout method. Generated graphs use 'zones' unless told otherwise"
+    )
+    rv.add_argument(
+        "--incremental", action="store_true", default=False,
+        help="Write only the Spiki files which have changed, and delete stale ones"
+    )
+    rv.add_argument(
+        "--cache", type=pathlib.Path, default=None,
+        help=f"Set the directory for cached Boards [{Cache.default_path()}]"
+    )
+    rv.add_argument("--no-cache", action="store_true", default=False, help="Always parse the input file")
     rv.convert_arg_line_to_args = lambda x: x.split()
     return rv
 
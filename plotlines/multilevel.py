@@ -0,0 +1,173 @@
+#! /usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of Plotlines.
+
+# Plotlines is free software: You can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+
+# Plotlines is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the
+# GNU General Public License along with Plotlines.
+# If not, see <https://www.gnu.org/licenses/>.
+
+from __future__ import annotations  # Until Python 3.14 is everywhere
+
+import math
+import random
+import statistics
+
+from plotlines.board import Graph
+from plotlines.board import Grid
+
+
+class Multilevel:
+    """
+    Multilevel force-directed layout of a Graph, after Walshaw (2003).
+
+    Matched pairs of adjacent Nodes collapse into one until the Graph is small.
+    That Graph is laid out, then each level in turn is expanded from its parent
+    and refined by forces between neighbours only. The repulsion between Nodes
+    is found with a Grid, so each level costs time in proportion to its size.
+
+    """
+
+    def __init__(
+        self,
+        graph: Graph,
+        length: float = 2,
+        coarsest: int = 16,
+        iterations: int = 24,
+        seed: int = None,
+    ):
+        self.graph = graph
+        self.unit = statistics.fmean(math.sqrt(i) for i in graph.area) if graph.nodes else 1
+        self.length = float(length) * (self.unit or 1)
+        self.coarsest = coarsest
+        self.iterations = iterations
+        self.random = random.Random(seed)
+        self.record = []
+
+    def edges(self) -> list[tuple[int, int]]:
+        "Pairs of adjacent Nodes, regardless of direction."
+        return sorted({(min(a, b), max(a, b)) for a, b in self.graph.pairs() if a != b})
+
+    def coarsen(self, size: int, edges: list, zone: list, mass: list) -> tuple[list[int], int, list, list, list]:
+        "Collapse a matching of the Nodes. Neighbours in the same zone and of least mass match first."
+        adjacent = [list() for _ in range(size)]
+        for a, b in edges:
+            adjacent[a].append(b)
+            adjacent[b].append(a)
+
+        order = list(range(size))
+        self.random.shuffle(order)
+        parent = [-1] * size
+        count = 0
+        for i in order:
+            if parent[i] >= 0:
+                continue
+
+            free = [j for j in adjacent[i] if parent[j] < 0]
+            if free:
+                parent[min(free, key=lambda j: (zone[j] != zone[i], mass[j]))] = count
+            parent[i] = count
+            count += 1
+
+        coarse_zone = [0] * count
+        coarse_mass = [0.0] * count
+        for i, p in enumerate(parent):
+            coarse_zone[p] = zone[i]
+            coarse_mass[p] += mass[i]
+        coarse_edges = sorted({
+            (min(parent[a], parent[b]), max(parent[a], parent[b])) for a, b in edges if parent[a] != parent[b]
+        })
+        return parent, count, coarse_edges, coarse_zone, coarse_mass
+
+    def refine(self, xs: list[float], ys: list[float], edges: list, mass: list, iterations: int, heat: float):
+        "Move Nodes by the forces of Fruchterman and Reingold, with repulsion cut off at twice the ideal length."
+        k = self.length
+        reach = 2 * k
+        for n in range(iterations):
+            grid = Grid(reach)
+            for i, pos in enumerate(zip(xs, ys)):
+                grid.add(i, pos)
+
+            dxs = [0.0] * len(xs)
+            dys = [0.0] * len(xs)
+            for i, pos in enumerate(zip(xs, ys)):
+                for j, (x, y) in grid.near(pos, reach):
+                    if i == j:
+                        continue
+                    dx, dy = pos[0] - x, pos[1] - y
+                    gap = dx * dx + dy * dy
+                    if not gap:
+                        dx, dy, gap = self.random.uniform(-1, 1), self.random.uniform(-1, 1), 1
+                    force = k * k * mass[j] / gap
+                    dxs[i] += dx * force
+                    dys[i] += dy * force
+
+            for a, b in edges:
+                dx, dy = xs[a] - xs[b], ys[a] - ys[b]
+                force = math.hypot(dx, dy) / k
+                dxs[a] -= dx * force
+                dys[a] -= dy * force
+                dxs[b] += dx * force
+                dys[b] += dy * force
+
+            # Cool linearly to a tenth of the starting heat
+            limit = heat * (1 - 0.9 * n / max(1, iterations - 1))
+            moved = 0
+            for i, (dx, dy) in enumerate(zip(dxs, dys)):
+                if (step := math.hypot(dx, dy)):
+                    scale = min(step, limit) / step
+                    xs[i] += dx * scale
+                    ys[i] += dy * scale
+                    moved = max(moved, min(step, limit))
+        return moved
+
+    def __call__(self) -> Graph:
+        "Lay out the Graph, leaving positions in its columns."
+        size = len(self.graph.nodes)
+        edges = self.edges()
+        zone = list(self.graph.zone)
+        mass = [1.0] * size
+
+        levels = [(size, edges, mass)]
+        parents = []
+        while size > self.coarsest:
+            parent, count, *coarse = self.coarsen(size, edges, zone, mass)
+            if count > 0.9 * size:
+                # Matching has stalled, eg: on a star
+                break
+            edges, zone, mass = coarse
+            parents.append(parent)
+            levels.append((count, edges, mass))
+            size = count
+
+        # Start the smallest Graph in columns by zone
+        ranks = dict()
+        xs, ys = [], []
+        for z in zone:
+            rank = ranks[z] = ranks.get(z, -1) + 1
+            xs.append(z * self.length + self.random.random())
+            ys.append(rank * self.length + self.random.random())
+
+        heat = self.length * math.sqrt(size)
+        self.record.append((size, self.refine(xs, ys, edges, mass, 4 * self.iterations, heat)))
+
+        jitter = self.length / 4
+        for parent, (size, edges, mass) in zip(reversed(parents), reversed(levels[:-1])):
+            xs = [xs[p] + self.random.uniform(-jitter, jitter) for p in parent]
+            ys = [ys[p] + self.random.uniform(-jitter, jitter) for p in parent]
+            self.record.append((size, self.refine(xs, ys, edges, mass, self.iterations, self.length)))
+
+        for n, (x, y) in enumerate(zip(xs, ys)):
+            self.graph.x[n] = x
+            self.graph.y[n] = y
+        return self.graph
@@ -0,0 +1,537 @@
+#! /usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of Plotlines.
+
+# Plotlines is free software: You can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+
+# Plotlines is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the
+# GNU General Public License along with Plotlines.
+# If not, see <https://www.gnu.org/licenses/>.
+
+from __future__ import annotations  # Until Python 3.14 is everywhere
+
+import array
+from collections.abc import Callable
+from decimal import Decimal
+import itertools
+import mmap
+import struct
+import sys
+import uuid
+
+from plotlines.board import Board
+from plotlines.board import Edge
+from plotlines.board import Node
+from plotlines.board import Port
+from plotlines.board import Style
+from plotlines.coordinates import Coordinates
+from plotlines.layout import Shape
+
+
+class Snapshot:
+    """
+    A compact binary form of a Board.
+
+    The file is a sequence of named sections, each one an array of fixed size values.
+    Strings and uids are interned into tables and referred to by index.
+    Numbers are stored as doubles with a code for their type, and integers in a
+    section of their own, so that a loaded Board writes exactly the same TOML
+    as the one which was saved.
+
+    """
+
+    magic = b"PLOTSNP2"
+    header = struct.Struct("<4scQ")
+
+    # Codes for the type of a number
+    FLOAT, INT, DECIMAL, NONE = range(4)
+
+    def __init__(self):
+        self.sections = dict()
+        self.strings = dict()
+        self.uids = dict()
+
+    def string(self, text: str) -> int:
+        return self.strings.setdefault(text, len(self.strings))
+
+    def uid(self, val: uuid.UUID | str) -> int:
+        return self.uids.setdefault(val, len(self.uids))
+
+    def numbers(self, name: str, values: list):
+        "Add a section of numbers, another of their type codes and a third of integers."
+        kinds = array.array("B")
+        vals = array.array("d")
+        ints = array.array("q")
+        for val in values:
+            if val is None:
+                kinds.append(self.NONE)
+                vals.append(0)
+            elif isinstance(val, Decimal):
+                kinds.append(self.DECIMAL)
+                vals.append(self.string(str(val)))
+            elif isinstance(val, int):
+                kinds.append(self.INT)
+                vals.append(len(ints))
+                ints.append(val)
+            else:
+                kinds.append(self.FLOAT)
+                vals.append(val)
+        self.sections[name] = vals
+        self.sections[name[:3] + "#"] = kinds
+        self.sections[name[:3] + "%"] = ints
+
+    def number(self, name: str, n: int):
+        kind = self.sections[name[:3] + "#"][n]
+        val = self.sections[name][n]
+        if kind == self.INT:
+            return self.sections[name[:3] + "%"][int(val)]
+        elif kind == self.DECIMAL:
+            return Decimal(self.text[int(val)])
+        elif kind == self.NONE:
+            return None
+        return val
+
+    def lookup(self, n: int) -> uuid.UUID | str:
+        "The uid at index n of the table."
+        data = bytes(self.sections["uTab"][16 * n:16 * n + 16])
+        if self.sections["uKnd"][n]:
+            return uuid.UUID(bytes=data)
+        return self.text[int.from_bytes(data, "little")]
+
+    def style(self, n: int) -> Style:
+        rgb = self.sections["sRGB"]
+        return Style.share(dict(
+            stroke=rgb[6 * n:6 * n + 3].tolist(), fill=rgb[6 * n + 3:6 * n + 6].tolist(), weight=self.number("sWgt", n)
+        ))
+
+    def rows(self, name: str, groups: list[list]):
+        "Add a section of compressed rows: offsets into a flat section of indices."
+        ptr = array.array("q", [0])
+        flat = array.array("q")
+        for group in groups:
+            flat.extend(group)
+            ptr.append(len(flat))
+        self.sections[name] = ptr
+        self.sections[name[:3] + "*"] = flat
+
+    def row(self, name: str, n: int) -> array.array:
+        ptr = self.sections[name]
+        return self.sections[name[:3] + "*"][ptr[n]:ptr[n + 1]]
+
+    def column(self, name: str, values: list, typecode="q"):
+        self.sections[name] = array.array(typecode, values)
+
+    def styles(self, items: list) -> list[int]:
+        table = dict()
+        for item in items:
+            table.setdefault(item.style, len(table))
+        self.column("sRGB", [c for style in table for c in (*style.stroke, *style.fill)])
+        self.numbers("sWgt", [style.weight for style in table])
+        return [table[item.style] for item in items]
+
+    @classmethod
+    def build(cls, board: Board) -> Snapshot:
+        "Gather the contents of a Board into tables."
+        rv = cls()
+        nodes = [i for i in board.items if isinstance(i, Node)]
+        edges = [i for i in board.items if isinstance(i, Edge)]
+
+        rv.column("bTtl", [rv.string(board.title)])
+        rv.column("hKey", [rv.string(key) for key in board.shapes])
+        rv.column("hLen", [len(shape.data) for shape in board.shapes.values()])
+        rv.numbers("hVal", [i for shape in board.shapes.values() for point in shape.data for i in point])
+
+        ports = []
+        for prefix, items in (("n", nodes), ("e", edges)):
+            rv.column(prefix + "Id_", [i.id for i in items])
+            rv.column(prefix + "Uid", [rv.uid(i.uid) for i in items])
+            rv.column(prefix + "Lbl", [rv.string(format(i.label)) for i in items])
+            rv.column(prefix + "Ttl", [rv.string(format(i.title)) for i in items])
+            rv.column(prefix + "Sty", rv.styles(items))
+            rv.rows(prefix + "Cnt", [[rv.string(format(c)) for c in i.contents] for i in items])
+
+            groups = []
+            for item in items:
+                handles = item.ports.items() if isinstance(item, Node) else ((None, p) for p in item.ports)
+                group = []
+                for handle, port in handles:
+                    group.append(len(ports))
+                    ports.append((handle, port))
+                groups.append(group)
+            rv.rows(prefix + "Prt", groups)
+
+        rv.column("nZon", [i.zone for i in nodes])
+        rv.numbers("nPos", [c for i in nodes for c in (i.pos or (None, None))])
+        rv.numbers("nAre", [i.area for i in nodes])
+
+        rv.column("pHdl", [-1 if handle is None else rv.string(handle) for handle, port in ports])
+        rv.column("pUid", [rv.uid(port.uid) for handle, port in ports])
+        rv.numbers("pPos", [c for handle, port in ports for c in (port.pos or (None, None))])
+        rv.rows("pJns", [[rv.uid(i) for i in sorted(port.joins, key=str)] for handle, port in ports])
+
+        # Tables go last, once everything is interned
+        data = [text.encode("utf-8") for text in rv.strings]
+        rv.column("tLen", [len(i) for i in data])
+        rv.column("tDat", b"".join(data), typecode="B")
+        rv.column("uTab", b"".join(rv.packed(i) for i in rv.uids), typecode="B")
+        rv.column("uKnd", [isinstance(i, uuid.UUID) for i in rv.uids], typecode="B")
+        return rv
+
+    def packed(self, val: uuid.UUID | str) -> bytes:
+        "Uids are 16 bytes. Any which are not UUIDs are kept in the string table."
+        if isinstance(val, uuid.UUID):
+            return val.bytes
+        return self.string(format(val)).to_bytes(16, "little")
+
+    def dump(self, stream) -> int:
+        "Write the sections to a binary stream."
+        stream.write(self.magic)
+        stream.write(b"l" if sys.byteorder == "little" else b"b")
+        rv = len(self.magic) + 1
+        for name, values in self.sections.items():
+            data = values.tobytes()
+            stream.write(self.header.pack(name.encode("ascii"), values.typecode.encode("ascii"), len(values)))
+            stream.write(data)
+            rv += self.header.size + len(data)
+        stream.flush()
+        return rv
+
+    @classmethod
+    def read(cls, stream) -> Snapshot:
+        "Read the sections of a binary stream."
+        if stream.read(len(cls.magic)) != cls.magic:
+            raise ValueError("Not a Plotlines snapshot")
+
+        order = stream.read(1)
+        if order not in (b"l", b"b"):
+            raise ValueError("Snapshot has no byte order")
+
+        swap = order != (b"l" if sys.byteorder == "little" else b"b")
+        rv = cls()
+        while chunk := stream.read(cls.header.size):
+            if len(chunk) != cls.header.size:
+                raise ValueError("Snapshot ends within the header of a section")
+            name, typecode, length = cls.header.unpack(chunk)
+            values = array.array(typecode.decode("ascii"))
+            data = stream.read(length * values.itemsize)
+            if len(data) != length * values.itemsize:
+                raise ValueError(f"Snapshot ends within section {name.decode('ascii')}")
+            values.frombytes(data)
+            if swap:
+                values.byteswap()
+            rv.sections[name.decode("ascii")] = values
+        return rv
+
+    def decode(self):
+        "Split the string table into its strings."
+        blob = self.sections["tDat"].tobytes()
+        self.text = []
+        start = 0
+        for length in self.sections["tLen"]:
+            self.text.append(blob[start:start + length].decode("utf-8"))
+            start += length
+
+    def make(self, prefix: str, n: int, lookup: Callable) -> Node | Edge:
+        "Make the Node or Edge at index n of the sections with this prefix, along with its Ports."
+        uid = lookup(self.sections[prefix + "Uid"][n])
+        ports = []
+        for p in self.row(prefix + "Prt", n):
+            handle = self.sections["pHdl"][p]
+            pos = [self.number("pPos", 2 * p), self.number("pPos", 2 * p + 1)]
+            joins = [lookup(i) for i in self.row("pJns", p)]
+            ports.append((
+                None if handle < 0 else self.text[handle],
+                Port(
+                    uid=lookup(self.sections["pUid"][p]),
+                    pos=Coordinates() if None in pos else Coordinates(*pos),
+                    joins=tuple(dict.fromkeys(joins if prefix == "n" else [uid, *joins])),
+                )
+            ))
+
+        data = dict(
+            id=self.sections[prefix + "Id_"][n],
+            uid=uid,
+            label=self.text[self.sections[prefix + "Lbl"][n]],
+            title=self.text[self.sections[prefix + "Ttl"][n]],
+            contents=[self.text[i] for i in self.row(prefix + "Cnt", n)],
+            style=self.style(self.sections[prefix + "Sty"][n]),
+        )
+        if prefix == "n":
+            pos = [self.number("nPos", 2 * n), self.number("nPos", 2 * n + 1)]
+            return Node(
+                zone=self.sections["nZon"][n], pos=[] if None in pos else pos, area=self.number("nAre", n),
+                ports=dict(ports), **data
+            )
+        return Edge(ports=[port for handle, port in ports], **data)
+
+    @classmethod
+    def load(cls, stream) -> Board:
+        "Read a Board from a binary stream, making its Items straight from the sections."
+        snapshot = cls.read(stream)
+        snapshot.decode()
+        table = [snapshot.lookup(n) for n in range(len(snapshot.sections["uKnd"]))]
+
+        rv = Board(title=snapshot.text[snapshot.sections["bTtl"][0]])
+        with rv:
+            items = [
+                snapshot.make(prefix, n, table.__getitem__)
+                for prefix in ("n", "e")
+                for n in range(len(snapshot.sections[prefix + "Id_"]))
+            ]
+        rv.extend(items)
+
+        values = iter(range(len(snapshot.sections["hVal"])))
+        for key, length in zip(snapshot.sections["hKey"], snapshot.sections["hLen"]):
+            points = tuple(
+                (snapshot.number("hVal", next(values)), snapshot.number("hVal", next(values)))
+                for i in range(length)
+            )
+            rv.shapes[snapshot.text[key]] = Shape(snapshot.text[key], points)
+        return rv
+
+
+class Text:
+    "The string table of a mapped snapshot, decoded one string at a time."
+
+    def __init__(self, lengths: memoryview, data: memoryview):
+        self.offsets = array.array("q", itertools.accumulate(lengths, initial=0))
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, n: int) -> str:
+        return bytes(self.data[self.offsets[n]:self.offsets[n + 1]]).decode("utf-8")
+
+
+class Handle:
+    "A lightweight view of one Node or Edge in a mapped snapshot."
+
+    __slots__ = ("board", "n")
+    prefix = ""
+    kind = None
+
+    def __init__(self, board: Mapped, n: int):
+        self.board = board
+        self.n = n
+
+    @property
+    def __class__(self):
+        # So that isinstance treats a Handle as the kind of Item it stands for
+        return self.kind
+
+    def __repr__(self):
+        return f"<{self.kind.__name__} handle {self.name}>"
+
+    def __eq__(self, other):
+        return isinstance(other, Handle) and (other.board, other.prefix, other.n) == (self.board, self.prefix, self.n)
+
+    def __hash__(self):
+        return hash((self.prefix, self.n))
+
+    def field(self, name: str) -> int:
+        return self.board.sections[self.prefix + name][self.n]
+
+    @property
+    def id(self) -> int:
+        return self.field("Id_")
+
+    @property
+    def uid(self) -> uuid.UUID | str:
+        return self.board.lookup(self.field("Uid"))
+
+    @property
+    def name(self) -> str:
+        if self.id:
+            return format(self.id, f"0{self.board.digits}d")
+        return format(self.uid)
+
+    @property
+    def label(self) -> str:
+        return self.board.text[self.field("Lbl")]
+
+    @property
+    def title(self) -> str:
+        return self.board.text[self.field("Ttl")]
+
+    @property
+    def contents(self) -> list[str]:
+        return [self.board.text[i] for i in self.board.row(self.prefix + "Cnt", self.n)]
+
+    @property
+    def item(self) -> Node | Edge:
+        "The Item itself, made on first access."
+        return self.board.materialize(self)
+
+    def __getattr__(self, name: str):
+        return getattr(self.item, name)
+
+
+class NodeHandle(Handle):
+
+    __slots__ = ()
+    prefix = "n"
+    kind = Node
+
+    @property
+    def zone(self) -> int:
+        return self.field("Zon")
+
+    @property
+    def connections(self) -> tuple[list[EdgeHandle], list[EdgeHandle]]:
+        return (
+            [self.board.edges[e] for e in self.board.inbound[self.n]],
+            [self.board.edges[e] for e in self.board.outbound[self.n]],
+        )
+
+
+class EdgeHandle(Handle):
+
+    __slots__ = ()
+    prefix = "e"
+    kind = Edge
+    trail = ""
+
+    @property
+    def ends(self) -> tuple[list[NodeHandle], list[NodeHandle]]:
+        return tuple([self.board.nodes[n] for n in end] for end in self.board.ends(self.n))
+
+    @property
+    def joins(self) -> list[NodeHandle]:
+        return [n for nodes in self.ends for n in nodes]
+
+
+class Mapped(Snapshot):
+    """
+    A Board read straight from a memory-mapped snapshot file.
+
+    Its items are Handles, which read their fields from the file as they are needed.
+    Contents are decoded only when asked for, and whole Items are made only
+    for attributes which Handles do not supply themselves.
+
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = self.view = memoryview(self.map)
+        if bytes(view[:len(self.magic)]) != self.magic:
+            self.close()
+            raise ValueError("Not a Plotlines snapshot")
+        if bytes(view[len(self.magic):len(self.magic) + 1]) != (b"l" if sys.byteorder == "little" else b"b"):
+            self.close()
+            raise ValueError("Snapshot has the wrong byte order to be mapped")
+
+        offset = len(self.magic) + 1
+        while offset < len(view):
+            if offset + self.header.size > len(view):
+                self.close()
+                raise ValueError("Snapshot ends within the header of a section")
+            name, typecode, length = self.header.unpack_from(view, offset)
+            offset += self.header.size
+            size = length * struct.calcsize(typecode.decode("ascii"))
+            if offset + size > len(view):
+                self.close()
+                raise ValueError(f"Snapshot ends within section {name.decode('ascii')}")
+            self.sections[name.decode("ascii")] = view[offset:offset + size].cast(typecode.decode("ascii"))
+            offset += size
+
+        self.text = Text(self.sections["tLen"], self.sections["tDat"])
+        self.title = self.text[self.sections["bTtl"][0]]
+        self.digits = len(str(max(itertools.chain(self.sections["nId_"], self.sections["eId_"]), default=0)))
+        self.nodes = [NodeHandle(self, n) for n in range(len(self.sections["nId_"]))]
+        self.edges = [EdgeHandle(self, n) for n in range(len(self.sections["eId_"]))]
+        self.items = self.nodes + self.edges
+        self.cache = Board()
+        self.made = dict()
+        self._adjacency = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def close(self):
+        for section in self.sections.values():
+            section.release()
+        self.sections.clear()
+        self.text = None
+        self.view.release()
+        self.map.close()
+        self.file.close()
+
+    def ends(self, e: int) -> tuple[list[int], list[int]]:
+        "The indices of the Nodes at the start and end of an Edge."
+        return self.adjacency[2][e]
+
+    @property
+    def adjacency(self) -> tuple[list, list, list]:
+        if self._adjacency is None:
+            index = {u: n for n, u in enumerate(self.sections["nUid"])}
+            inbound = [[] for _ in self.nodes]
+            outbound = [[] for _ in self.nodes]
+            ends = []
+            for e, u in enumerate(self.sections["eUid"]):
+                ports = self.row("ePrt", e)
+                src, dst = (
+                    [index[j] for j in self.row("pJns", p) if j != u and j in index] for p in ports[:2]
+                )
+                for n in src:
+                    outbound[n].append(e)
+                for n in dst:
+                    inbound[n].append(e)
+                ends.append((src, dst))
+            self._adjacency = (inbound, outbound, ends)
+        return self._adjacency
+
+    @property
+    def inbound(self) -> list[list[int]]:
+        return self.adjacency[0]
+
+    @property
+    def outbound(self) -> list[list[int]]:
+        return self.adjacency[1]
+
+    @property
+    def initial(self) -> list[NodeHandle]:
+        return [h for h in self.nodes if self.outbound[h.n] and not self.inbound[h.n]]
+
+    @property
+    def terminal(self) -> list[NodeHandle]:
+        return [h for h in self.nodes if self.inbound[h.n] and not self.outbound[h.n]]
+
+    @property
+    def shapes(self) -> dict[str, Shape]:
+        rv = {}
+        values = iter(range(len(self.sections["hVal"])))
+        for key, length in zip(self.sections["hKey"], self.sections["hLen"]):
+            points = tuple(
+                (self.number("hVal", next(values)), self.number("hVal", next(values)))
+                for i in range(length)
+            )
+            rv[self.text[key]] = Shape(self.text[key], points)
+        return rv
+
+    def materialize(self, handle: Handle) -> Node | Edge:
+        "Make the Item for a Handle, with its Ports."
+        key = (handle.prefix, handle.n)
+        if key in self.made:
+            return self.made[key]
+
+        with self.cache:
+            rv = self.make(handle.prefix, handle.n, self.lookup)
+        self.cache.extend([rv])
+        self.made[key] = rv
+        return rv
@@ -0,0 +1,124 @@
+#! /usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of Plotlines.
+
+# Plotlines is free software: You can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+
+# Plotlines is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the
+# GNU General Public License along with Plotlines.
+# If not, see <https://www.gnu.org/licenses/>.
+
+from __future__ import annotations  # Until Python 3.14 is everywhere
+
+import math
+
+from plotlines.board import Edge
+from plotlines.board import Grid
+from plotlines.board import Node
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Spacing:
+    """
+    Distances in one batch between the points of some Nodes and the points
+    of other Nodes and Edges.
+
+    A point is the position of a Node or one of its Ports. Edges contribute their
+    Ports as points, and also the line between them.
+
+    Without numpy, a Grid which indexes the points finds the nearest one from its cells
+    rather than by measuring against every other point.
+
+    """
+
+    def __init__(
+        self, nodes: list[Node], others: list[Node | Edge] = None, vectorize: bool = None, grid: Grid = None
+    ):
+        others = nodes if others is None else others
+        self.vectorize = numpy is not None if vectorize is None else vectorize and numpy is not None
+        self.grid = grid
+        self.rows = [pin for node in nodes for pin in (node, *node.ports.values()) if pin.pos is not None]
+        items = {item.uid: item for item in others}.values()
+        self.cols = list({
+            pin.uid: pin
+            for item in items
+            for pin in ((item, *item.ports.values()) if isinstance(item, Node) else item.ports)
+            if pin.pos is not None
+        }.values())
+        self.lines = [
+            (item.ports[0].pos, item.ports[1].pos)
+            for item in items
+            if isinstance(item, Edge) and None not in (item.ports[0].pos, item.ports[1].pos)
+            and item.ports[0].pos != item.ports[1].pos
+        ]
+
+    def matrix(self):
+        "Distances from each row point to each column point."
+        if self.vectorize:
+            a = numpy.array([pin.pos for pin in self.rows], dtype=float).reshape(-1, 2)
+            b = numpy.array([pin.pos for pin in self.cols], dtype=float).reshape(-1, 2)
+            delta = a[:, None, :] - b[None, :, :]
+            return numpy.hypot(delta[..., 0], delta[..., 1])
+
+        return [[math.dist(r.pos, c.pos) for c in self.cols] for r in self.rows]
+
+    def offsets(self):
+        "Distances from each row point to the line of each Edge."
+        if self.vectorize:
+            a = numpy.array([pin.pos for pin in self.rows], dtype=float).reshape(-1, 2)
+            origin = numpy.array([o for o, t in self.lines], dtype=float).reshape(-1, 2)
+            span = numpy.array([t for o, t in self.lines], dtype=float).reshape(-1, 2) - origin
+            delta = a[:, None, :] - origin[None, :, :]
+            cross = delta[..., 0] * span[None, :, 1] - delta[..., 1] * span[None, :, 0]
+            return numpy.abs(cross) / numpy.hypot(span[:, 0], span[:, 1])[None, :]
+
+        return [
+            [
+                abs((r.pos[0] - o[0]) * (t[1] - o[1]) - (r.pos[1] - o[1]) * (t[0] - o[0])) / math.dist(o, t)
+                for o, t in self.lines
+            ]
+            for r in self.rows
+        ]
+
+    def indexed(self) -> list[float]:
+        "The smallest non-zero distance from each row point, searching the Grid for the nearest point."
+        scope = {pin.uid for pin in self.cols if pin.uid in self.grid}
+        loose = [pin for pin in self.cols if pin.uid not in scope]
+        rv = []
+        for pin, line in zip(self.rows, self.offsets()):
+            dist, uid = self.grid.nearest(pin.pos, within=scope)
+            rest = [math.dist(pin.pos, i.pos) for i in loose] + line
+            rv.append(min([dist] + [i for i in rest if i > 0]))
+        return rv
+
+    def nearest(self) -> list[float]:
+        "The smallest non-zero distance from each row point."
+        if self.grid is not None and not self.vectorize:
+            return self.indexed()
+
+        if self.vectorize:
+            rv = numpy.concatenate([self.matrix(), self.offsets()], axis=1)
+            rv = numpy.where(rv > 0, rv, numpy.inf).min(axis=1, initial=numpy.inf)
+            return rv.tolist()
+
+        return [
+            min((i for i in row + line if i > 0), default=math.inf)
+            for row, line in zip(self.matrix(), self.offsets())
+        ]
+
+    def minimum(self) -> float:
+        "The smallest non-zero distance in the batch."
+        return min(self.nearest(), default=math.inf)
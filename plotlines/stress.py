@@ -0,0 +1,194 @@
+#! /usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of Plotlines.
+
+# Plotlines is free software: You can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+
+# Plotlines is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the
+# GNU General Public License along with Plotlines.
+# If not, see <https://www.gnu.org/licenses/>.
+
+from __future__ import annotations  # Until Python 3.14 is everywhere
+
+import array
+from collections import deque
+import math
+import random
+import statistics
+
+from plotlines.board import Board
+from plotlines.board import Graph
+from plotlines.schema import LayoutMode
+from plotlines.schema import OptimizationMethod
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Stress:
+    """
+    Stress majorization of a Graph, after Gansner, Koren and North (2004).
+
+    The ideal distance between two Nodes is the number of Edges between them,
+    regardless of direction, times the ideal length of a connector.
+    That length is a multiple of the mean size of the Nodes, by default the
+    Dunnart option `defaultIdealConnectorLength` of a Board.
+
+    """
+
+    def __init__(
+        self,
+        graph: Graph,
+        length: float = None,
+        iterations: int = 200,
+        tolerance: float = 1e-3,
+        seed: int = None,
+        vectorize: bool = None,
+    ):
+        self.graph = graph
+        self.unit = statistics.fmean(math.sqrt(i) for i in graph.area) if graph.nodes else 1
+        length = Board.xml_options["defaultIdealConnectorLength"] if length is None else length
+        self.length = float(length) * self.unit
+        self.iterations = iterations
+        self.tolerance = tolerance
+        self.random = random.Random(seed)
+        self.vectorize = numpy is not None if vectorize is None else vectorize and numpy is not None
+        self.record = []
+
+    @classmethod
+    def build(cls, board: Board, **kwargs) -> Stress:
+        "Configure from the Dunnart options of the Board."
+        options = board.xml_options
+        if options.get("layoutMode") != LayoutMode.OrganicLayout:
+            raise ValueError(f"Unsupported layout mode: {options.get('layoutMode')!r}")
+        if options.get("layoutMethod") != OptimizationMethod.MAJORIZATION:
+            raise ValueError(f"Unsupported layout method: {options.get('layoutMethod')!r}")
+
+        length = options.get("defaultIdealConnectorLength")
+        return cls(Graph.build(board.items), length=length, **kwargs)
+
+    def hops(self) -> list[array.array]:
+        "Count the Edges on the shortest path between each pair of Nodes."
+        size = len(self.graph.nodes)
+        neighbours = [list() for _ in range(size)]
+        for src, dst in self.graph.pairs():
+            neighbours[src].append(dst)
+            neighbours[dst].append(src)
+
+        rv = []
+        for n in range(size):
+            row = array.array("d", [math.inf]) * size
+            row[n] = 0
+            work = deque([n])
+            while work:
+                i = work.popleft()
+                for j in neighbours[i]:
+                    if row[j] == math.inf:
+                        row[j] = row[i] + 1
+                        work.append(j)
+            rv.append(row)
+        return rv
+
+    def distances(self) -> list[array.array]:
+        "Ideal distances between Nodes. Separate components are kept one length apart."
+        rv = self.hops()
+        if self.vectorize:
+            rv = numpy.array(rv, dtype=float)
+            finite = numpy.isfinite(rv)
+            furthest = rv[finite].max(initial=0) + 1
+            return numpy.where(finite, rv, furthest) * self.length
+
+        furthest = max((i for row in rv for i in row if i != math.inf), default=0) + 1
+        for row in rv:
+            for n, val in enumerate(row):
+                row[n] = self.length * (furthest if val == math.inf else val)
+        return rv
+
+    def start(self) -> tuple[list[float], list[float]]:
+        "Take existing positions, or else place Nodes in columns by zone."
+        ranks = dict()
+        xs, ys = [], []
+        for n, zone in enumerate(self.graph.zone):
+            rank = ranks[zone] = ranks.get(zone, -1) + 1
+            if math.isnan(self.graph.x[n]):
+                xs.append(zone * self.length + self.random.random())
+                ys.append(rank * self.length + self.random.random())
+            else:
+                xs.append(self.graph.x[n])
+                ys.append(self.graph.y[n])
+        return xs, ys
+
+    def step(self, xs: list[float], ys: list[float], dists: list[array.array]) -> float:
+        "Move each Node in turn to minimise its stress. Return the largest movement."
+        rv = 0
+        for i, row in enumerate(dists):
+            sum_w = sum_x = sum_y = 0
+            for j, dist in enumerate(row):
+                if i == j:
+                    continue
+                weight = dist ** -2
+                dx, dy = xs[i] - xs[j], ys[i] - ys[j]
+                gap = math.hypot(dx, dy) or 1e-9
+                sum_w += weight
+                sum_x += weight * (xs[j] + dist * dx / gap)
+                sum_y += weight * (ys[j] + dist * dy / gap)
+
+            if sum_w:
+                x, y = sum_x / sum_w, sum_y / sum_w
+                rv = max(rv, math.hypot(x - xs[i], y - ys[i]))
+                xs[i], ys[i] = x, y
+        return rv
+
+    def solve(self, xs: list[float], ys: list[float], dist: numpy.ndarray) -> tuple[list[float], list[float]]:
+        "Vectorized iterations of the same update."
+        if len(xs) < 2:
+            # Nothing to move relative to
+            return xs, ys
+
+        pos = numpy.column_stack((xs, ys))
+        with numpy.errstate(divide="ignore"):
+            weight = numpy.where(dist > 0, dist ** -2.0, 0.0)
+        total = weight.sum(axis=1)[:, None]
+        total[total == 0] = 1
+
+        for n in range(self.iterations):
+            diff = pos[:, None, :] - pos[None, :, :]
+            gap = numpy.hypot(diff[..., 0], diff[..., 1])
+            gap[gap == 0] = 1e-9
+            coeff = weight * dist / gap
+            update = (weight @ pos + numpy.einsum("ij,ijk->ik", coeff, diff)) / total
+            moved = float(numpy.hypot(*(update - pos).T).max(initial=0))
+            pos = update
+            self.record.append(moved)
+            if moved < self.tolerance * self.length:
+                break
+        return pos[:, 0].tolist(), pos[:, 1].tolist()
+
+    def __call__(self) -> Graph:
+        "Lay out the Graph, leaving positions in its columns."
+        dists = self.distances()
+        xs, ys = self.start()
+        if self.vectorize:
+            xs, ys = self.solve(xs, ys, dists)
+        else:
+            for n in range(self.iterations):
+                moved = self.step(xs, ys, dists)
+                self.record.append(moved)
+                if moved < self.tolerance * self.length:
+                    break
+
+        for n, (x, y) in enumerate(zip(xs, ys)):
+            self.graph.x[n] = x
+            self.graph.y[n] = y
+        return self.graph
@@ -17,11 +17,14 @@
 # GNU General Public License along with Plotlines.
 # If not, see <https://www.gnu.org/licenses/>.
 
+import contextvars
 import dataclasses
 from decimal import Decimal
 from fractions import Fraction
 import functools
 import importlib.resources
+import io
+import math
 import textwrap
 import tkinter as tk
 import tomllib
@@ -29,13 +32,17 @@ import turtle
 from types import SimpleNamespace as NS
 import unittest.mock
 import uuid
+import weakref
 import xml.etree.ElementTree as ET
 
 from plotlines.board import Board
 from plotlines.board import Edge
+from plotlines.board import Graph
+from plotlines.board import Grid
 from plotlines.board import Node
 from plotlines.board import Pin
 from plotlines.board import Port
+from plotlines.board import Registry
 from plotlines.board import RGB
 from plotlines.board import Style
 from plotlines.coordinates import Coordinates as C
@@ -73,9 +80,9 @@ class EdgeTests(unittest.TestCase):
         edge = Edge.build(**data)
         self.assertTrue(edge)
         self.assertIsInstance(edge.uid, uuid.UUID)
-        self.assertIsInstance(edge.ports[0].joins, set)
+        self.assertIsInstance(edge.ports[0].joins, tuple)
         self.assertIsInstance(edge.ports[0].pos, C)
-        self.assertIsInstance(edge.ports[1].joins, set)
+        self.assertIsInstance(edge.ports[1].joins, tuple)
         self.assertIsInstance(edge.ports[1].pos, C)
 
         self.assertEqual(len(edge.ports[0].joins), 1, edge.ports[0].joins)
@@ -120,9 +127,9 @@ class NodeTests(unittest.TestCase):
         self.assertTrue(node)
 
         self.assertIsInstance(node.uid, uuid.UUID)
-        self.assertIsInstance(node.ports["E"].joins, set)
+        self.assertIsInstance(node.ports["E"].joins, tuple)
         self.assertIsInstance(node.ports["E"].pos, C)
-        self.assertIsInstance(node.ports["W"].joins, set)
+        self.assertIsInstance(node.ports["W"].joins, tuple)
         self.assertIsInstance(node.ports["W"].pos, C)
 
         self.assertEqual(len(node.ports["E"].joins), 0, node.ports["E"].joins)
@@ -169,15 +176,15 @@ class BoardTests(unittest.TestCase):
         nodes = [Node(), Node()]
         edge = nodes[0].connect(nodes[1])
         self.assertIsInstance(edge, Edge)
-        self.assertEqual(edge.ports[0].joins, {edge.uid, nodes[0].uid})
-        self.assertEqual(edge.ports[1].joins, {edge.uid, nodes[1].uid})
-        self.assertEqual(nodes[0].ports["00"].joins, {edge.uid, nodes[0].uid})
-        self.assertEqual(nodes[1].ports["00"].joins, {edge.uid, nodes[1].uid})
+        self.assertEqual(edge.ports[0].joins, (edge.uid, nodes[0].uid))
+        self.assertEqual(edge.ports[1].joins, (edge.uid, nodes[1].uid))
+        self.assertEqual(nodes[0].ports["00"].joins, (edge.uid, nodes[0].uid))
+        self.assertEqual(nodes[1].ports["00"].joins, (edge.uid, nodes[1].uid))
 
     def test_node_nearby(self):
-        Node.store.clear()
-        nodes = [Node(), Node()]
-        edge = nodes[0].connect(nodes[1])
+        with Board():
+            nodes = [Node(), Node()]
+            edge = nodes[0].connect(nodes[1])
         self.assertIn(nodes[1], nodes[0].nearby)
         self.assertNotIn(nodes[0], nodes[0].nearby)
         self.assertIn(nodes[0], nodes[1].nearby)
@@ -193,6 +200,115 @@ class BoardTests(unittest.TestCase):
                 self.assertIn(edge, node.edges)
                 self.assertEqual(len(node.edges), 1)
 
+    def test_node_connections(self):
+        nodes = [Node(), Node(), Node()]
+        edges = [nodes[0].connect(nodes[1]), nodes[1].connect(nodes[2])]
+
+        self.assertEqual(nodes[1].connections, ([edges[0]], [edges[1]]))
+        self.assertEqual(nodes[1].edges, edges)
+        self.assertEqual(edges[1].joins, nodes[1:])
+
+    def test_board_index(self):
+        nodes, edges = self.build_3_nodes()
+        self.assertIn(edges[0].uid, Registry.active.get().outbound[nodes[0].uid])
+
+        board = Board(items=nodes + edges)
+        self.assertTrue(all(i.store is board.store for i in board.items))
+        self.assertNotIn(edges[0].uid, Registry.active.get().outbound.get(nodes[0].uid, ()))
+        self.assertEqual(list(board.store.outbound[nodes[0].uid]), [edges[0].uid])
+        self.assertEqual(list(board.store.inbound[nodes[2].uid]), [edges[1].uid])
+        self.assertEqual(nodes[1].nearby, [nodes[0], nodes[2]])
+
+        edge = nodes[2].connect(nodes[0])
+        self.assertIs(edge.store, board.store)
+        self.assertEqual(nodes[0].connections, ([edge], [edges[0]]))
+
+    def test_board_registry(self):
+        with Board() as board:
+            nodes, edges = self.build_3_nodes()
+        board.extend(nodes + edges)
+        self.assertIsNot(Registry.active.get(), board.store)
+        self.assertTrue(all(board.store[i.uid] is i for i in board.items))
+        self.assertTrue(all(i.uid not in Registry.active.get() for i in board.items))
+
+        witness = weakref.ref(nodes[1])
+        del nodes, edges, board
+        self.assertIsNone(witness())
+
+    def test_board_registry_nested(self):
+        outer, inner = Board(), Board()
+        with outer:
+            with inner:
+                self.assertIs(Registry.active.get(), inner.store)
+                # A copied context keeps the Registry which was active when it was made
+                context = contextvars.copy_context()
+            node = Node()
+        self.assertIs(node.store, outer.store)
+        self.assertIs(context.run(Registry.active.get), inner.store)
+        self.assertIsNot(Registry.active.get(), outer.store)
+
+    def test_board_registry_moved(self):
+        prior = Registry()
+        token = Registry.active.set(prior)
+        try:
+            nodes, edges = self.build_3_nodes()
+        finally:
+            Registry.active.reset(token)
+        self.assertTrue(prior.dirty)
+        self.assertTrue(prior.inbound)
+
+        board = Board(items=nodes + edges)
+        self.assertEqual(len(prior), 0)
+        for index in (prior.inbound, prior.outbound, prior.initial, prior.terminal, prior.dirty, prior.unsaved):
+            with self.subTest(index=index):
+                self.assertFalse(index)
+        self.assertEqual(board.initial, [nodes[0]])
+
+        board.store.unlink(edges[0])
+        self.assertNotIn(nodes[0].uid, board.store.outbound)
+        self.assertNotIn(nodes[1].uid, board.store.inbound)
+
+    def test_board_registry_separate(self):
+        nodes, edges = self.build_3_nodes()
+        data = tomllib.loads("\n".join(Board(items=nodes + edges).toml()))
+        boards = [Board.build(data), Board.build(data)]
+        self.assertEqual([i.uid for i in boards[0].items], [i.uid for i in boards[1].items])
+        for board in boards:
+            with self.subTest(board=board):
+                self.assertTrue(all(board.store[i.uid] is i for i in board.items))
+                self.assertEqual(len(board.initial), 1)
+                self.assertEqual(len(board.initial[0].nearby), 1)
+
+    def test_registry_allocate(self):
+        with Board() as board:
+            nodes = [Node(id=7), Node(id=100), Node()]
+        self.assertEqual([i.name for i in nodes[:2]], ["007", "100"])
+        self.assertEqual(nodes[2].name, format(nodes[2].uid))
+        self.assertEqual(board.store.allocate(), 101)
+        self.assertEqual(nodes[0].name, "007")
+
+        nodes.append(Node(id=board.store.allocate()))
+        board.extend(nodes)
+        self.assertEqual(nodes[-1].name, "102")
+        self.assertEqual(board.store.digits, 3)
+
+    def test_slots(self):
+        nodes, edges = self.build_3_nodes()
+        for item in nodes + edges + [nodes[0].ports["00"]]:
+            with self.subTest(item=item):
+                self.assertFalse(hasattr(item, "__dict__"))
+                self.assertIs(weakref.ref(item)(), item)
+
+    def test_style_shared(self):
+        nodes, edges = self.build_3_nodes()
+        self.assertIs(nodes[0].style, nodes[2].style)
+        self.assertIs(nodes[0].style, edges[0].style)
+        self.assertIsNot(nodes[0].style, nodes[1].style)
+        self.assertIs(Style.share(dict(stroke=[127, 127, 127], fill=[32, 32, 32], weight=10)), nodes[1].style)
+        self.assertIsInstance(nodes[1].style.stroke, C)
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            nodes[0].style.weight = 2
+
     def test_node_spacing_node_self(self):
         node = Node((1, 3))
 
@@ -246,6 +362,43 @@ class BoardTests(unittest.TestCase):
         self.assertEqual(len(board.terminal), 1, board.terminal)
         self.assertIs(board.terminal[0], nodes[-1])
 
+    def test_3_nodes_initial_terminal_update(self):
+        nodes, edges = self.build_3_nodes()
+        board = Board(items=nodes + edges)
+        self.assertEqual(list(board.store.initial), [nodes[0].uid])
+        self.assertEqual(list(board.store.terminal), [nodes[2].uid])
+
+        with board:
+            node = Node()
+        board.extend([node, nodes[2].connect(node)])
+        self.assertEqual(board.initial, [nodes[0]])
+        self.assertEqual(board.terminal, [node])
+
+        board.extend([node.connect(nodes[0])])
+        self.assertEqual(board.initial, [])
+        self.assertEqual(board.terminal, [])
+
+    def test_3_nodes_initial_terminal_collected(self):
+        nodes, edges = self.build_3_nodes()
+        board = Board(items=nodes + edges)
+        board.items[:] = nodes
+        self.assertEqual(board.initial, [nodes[0]])
+        self.assertEqual(board.terminal, [nodes[2]])
+
+        # Edges which are dropped without being unlinked no longer count
+        witness = weakref.ref(edges[1])
+        del edges[1]
+        self.assertIsNone(witness())
+        self.assertEqual(board.initial, [nodes[0]])
+        self.assertEqual(board.terminal, [nodes[1]])
+        self.assertNotIn(nodes[2].uid, board.store.inbound)
+
+        del edges
+        self.assertEqual(board.initial, [])
+        self.assertEqual(board.terminal, [])
+        self.assertFalse(board.store.inbound)
+        self.assertFalse(board.store.outbound)
+
     def test_3_nodes_toml(self):
         nodes, edges = self.build_3_nodes()
         for node in nodes:
@@ -378,3 +531,125 @@ class BoardTests(unittest.TestCase):
         self.assertEqual(node.edges[0].label, "A arc")
         self.assertEqual(node.contents, ["Good ending.\n\n<NARRATOR>\tOr is it?"], rv)
         self.assertEqual(node.edges[0].contents, ["This is what happens if you go left."])
+
+    def test_3_nodes_write(self):
+        nodes, edges = self.build_3_nodes()
+        board = Board(items=nodes + edges)
+        for mode in ("toml", "svg", "xml"):
+            with self.subTest(mode=mode):
+                check = "\n".join(getattr(board, mode)())
+                text = io.StringIO()
+                self.assertEqual(board.dump(text, mode=mode), len(check))
+                self.assertEqual(text.getvalue(), check)
+
+                data = io.BytesIO()
+                stream = unittest.mock.Mock(wraps=data, spec=io.BufferedIOBase)
+                Board.write(getattr(board, mode)(), stream, size=64)
+                self.assertEqual(data.getvalue(), check.encode("utf-8"))
+                self.assertGreater(stream.write.call_count, 2)
+                stream.flush.assert_called_once()
+
+    def test_merge_stream(self):
+        for path in importlib.resources.files("plotlines.test.data").iterdir():
+            if not path.name.endswith((".svg", ".xml")):
+                continue
+
+            with self.subTest(path=path.name):
+                board = Board()
+                check = board.merge(ET.fromstring(path.read_text()))
+                with path.open("rb") as source:
+                    board = Board()
+                    items = board.merge_stream(source)
+
+                self.assertTrue(items)
+                self.assertEqual(
+                    [(type(i), i.id, i.label, getattr(i, "pos", None)) for i in items],
+                    [(type(i), i.id, i.label, getattr(i, "pos", None)) for i in check]
+                )
+                self.assertEqual(
+                    [[p.pos for p in i.ports] for i in items if isinstance(i, Edge)],
+                    [[p.pos for p in i.ports] for i in check if isinstance(i, Edge)],
+                )
+
+
+class GraphTests(unittest.TestCase):
+
+    def test_3_nodes_csr(self):
+        nodes, edges = BoardTests.build_3_nodes()
+        graph = Graph.build(nodes + edges)
+        self.assertEqual(list(graph.src), [0, 1])
+        self.assertEqual(list(graph.dst), [1, 2])
+        self.assertEqual(list(graph.out_ptr), [0, 1, 2, 2])
+        self.assertEqual(list(graph.in_ptr), [0, 0, 1, 2])
+        self.assertEqual(list(graph.exits(1)), [1])
+        self.assertEqual(list(graph.entries(1)), [0])
+        self.assertEqual(graph.reachable(1), {1, 2})
+
+    def test_edge_off_graph(self):
+        nodes, edges = BoardTests.build_3_nodes()
+        graph = Graph.build(nodes[:2] + edges)
+        self.assertEqual(graph.edges, edges)
+        self.assertEqual(list(graph.src), [0, 1])
+        self.assertEqual(list(graph.dst), [1, -1])
+        self.assertEqual(list(graph.pairs()), [(0, 1)])
+        self.assertEqual(list(graph.exits(1)), [1])
+        self.assertEqual(list(graph.in_edges), [0])
+        self.assertEqual(graph.reachable(0), {0, 1})
+
+        boundary = [C(0, 0), C(0, 400), C(300, 0), C(400, 300)]
+        list(graph.place(boundary))
+        graph.write()
+        self.assertEqual(edges[1].ports[0].pos[0], nodes[1].pos[0] + nodes[1].width / 2)
+        self.assertEqual(edges[1].ports[1].pos, C(110, 20))
+
+    def test_3_nodes_initial_terminal(self):
+        nodes, edges = BoardTests.build_3_nodes()
+        board = Board(items=nodes + edges)
+        graph = Graph.build(board.items)
+        self.assertEqual(graph.initial, board.initial)
+        self.assertEqual(graph.terminal, board.terminal)
+
+    def test_3_nodes_extent(self):
+        nodes, edges = BoardTests.build_3_nodes()
+        graph = Graph.build(nodes + edges)
+        self.assertEqual(Board.extent(graph), Board.extent(nodes + edges))
+        self.assertEqual(Board.extent(graph), (C(20, 20), C(120, 20)))
+
+    def test_write(self):
+        nodes, edges = BoardTests.build_3_nodes()
+        graph = Graph.build(nodes + edges)
+        graph.x[1] = 75
+        graph.port_y[1][0] = 25
+        graph.write()
+        self.assertEqual(nodes[1].pos, (75, 20))
+        self.assertEqual(edges[0].ports[1].pos, (60, 25))
+
+
+class GridTests(unittest.TestCase):
+
+    def test_nearest(self):
+        grid = Grid(size=10)
+        grid.add("a", C(0, 0))
+        grid.add("b", C(3, 4))
+        grid.add("c", C(95, 5))
+        self.assertEqual(grid.nearest(C(0, 0)), (5, "b"))
+        self.assertEqual(grid.nearest(C(0, 0), exclude={"b"})[1], "c")
+        self.assertEqual(grid.nearest(C(90, 0)), (math.dist((90, 0), (95, 5)), "c"))
+        self.assertEqual(sorted(uid for uid, pos in grid.near(C(1, 1), 6)), ["a", "b"])
+
+        grid.discard("c")
+        self.assertEqual(grid.nearest(C(0, 0), exclude={"b"}), (math.inf, None))
+        self.assertEqual(len(grid), 2)
+
+    def test_3_nodes_spacing(self):
+        nodes, edges = BoardTests.build_3_nodes()
+        board = Board(items=nodes + edges)
+        grid = board.store.grid = Grid.build(board.items)
+        self.assertEqual(grid.size, 40)
+
+        spacing = nodes[0].spacing(grid)
+        self.assertEqual(spacing[(nodes[0].ports["00"], nodes[1].ports["00"])], 30)
+
+        nodes[1].translate(C(0, 100))
+        self.assertEqual(grid.where[nodes[1].uid], grid.cell(nodes[1].pos))
+        self.assertEqual(min(nodes[0].spacing(grid).values()), 80)
@@ -0,0 +1,109 @@
+#! /usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of Plotlines.
+
+# Plotlines is free software: You can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+
+# Plotlines is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the
+# GNU General Public License along with Plotlines.
+# If not, see <https://www.gnu.org/licenses/>.
+
+import importlib.resources
+import os
+import pathlib
+import tempfile
+import tomllib
+import unittest
+from unittest.mock import patch
+
+import plotlines
+from plotlines.board import Board
+from plotlines.cache import Cache
+
+
+class CacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.cache = Cache(pathlib.Path(self.temp.name).joinpath("cache"))
+        self.source = importlib.resources.files("plotlines.test.data").joinpath("fruition-revisit.toml")
+        self.calls = []
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def build(self, path: pathlib.Path) -> Board:
+        self.calls.append(path)
+        return Board.build(tomllib.loads(path.read_text(encoding="utf-8")))
+
+    def test_key(self):
+        key = Cache.key(b"abc", ".toml")
+        self.assertEqual(key, Cache.key(b"abc", ".toml"))
+        self.assertNotEqual(key, Cache.key(b"abd", ".toml"))
+        self.assertNotEqual(key, Cache.key(b"abc", ".svg"))
+        with patch.object(plotlines, "__version__", "0.0.0"):
+            self.assertNotEqual(key, Cache.key(b"abc", ".toml"))
+
+    def test_key_file(self):
+        data = self.source.read_bytes()
+        with self.source.open("rb") as source, patch.object(Cache, "block", 1000):
+            self.assertEqual(Cache.key(source, ".toml"), Cache.key(data, ".toml"))
+
+    def test_hit(self):
+        expected = self.cache.load(self.source, self.build)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(len(list(self.cache.path.glob("*.snap"))), 1)
+
+        rv = self.cache.load(self.source, self.build)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual("\n".join(rv.toml()), "\n".join(expected.toml()))
+
+    def test_failed_build(self):
+        self.assertIsNone(self.cache.load(self.source, lambda data: None))
+        self.assertFalse(self.cache.path.exists())
+
+    def test_corrupt_entry(self):
+        self.cache.load(self.source, self.build)
+        entry = next(self.cache.path.glob("*.snap"))
+        entry.write_bytes(b"nonsense")
+        with self.assertLogs("plotlines.cache", level="WARNING"):
+            rv = self.cache.load(self.source, self.build)
+        self.assertEqual(len(self.calls), 2)
+        self.assertTrue(rv.items)
+
+    def test_truncated_entry(self):
+        self.cache.load(self.source, self.build)
+        entry = next(self.cache.path.glob("*.snap"))
+        data = entry.read_bytes()
+        for size in (12, 20, len(data) - 3):
+            with self.subTest(size=size):
+                entry.write_bytes(data[:size])
+                with self.assertLogs("plotlines.cache", level="WARNING"):
+                    rv = self.cache.load(self.source, self.build)
+                self.assertTrue(rv.items)
+        self.assertEqual(len(self.calls), 4)
+
+    def test_evict(self):
+        board = self.build(self.source)
+        paths = [self.cache.put(Cache.key(bytes([n])), board) for n in range(4)]
+        for n, path in enumerate(paths):
+            os.utime(path, ns=(n * 10**9, n * 10**9))
+        size = paths[0].stat().st_size
+
+        self.cache.limit = 2 * size
+        self.assertEqual(self.cache.evict(), paths[:2])
+        self.assertEqual(sorted(self.cache.path.glob("*.snap")), sorted(paths[2:]))
+
+        # A new entry survives, even when it alone is over the limit
+        self.cache.limit = 0
+        path = self.cache.put(Cache.key(b"new"), board)
+        self.assertEqual(list(self.cache.path.glob("*.snap")), [path])
@@ -0,0 +1,210 @@
+#! /usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of Plotlines.
+
+# Plotlines is free software: You can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+
+# Plotlines is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the
+# GNU General Public License along with Plotlines.
+# If not, see <https://www.gnu.org/licenses/>.
+
+import difflib
+import importlib.resources
+import io
+import tomllib
+import unittest
+
+from plotlines.board import Edge
+from plotlines.board import Node
+from plotlines.coordinates import Coordinates
+from plotlines.document import Document
+from plotlines.layout import Layout
+from plotlines.layout import Shape
+
+
+class DocumentTests(unittest.TestCase):
+
+    def setUp(self):
+        self.text = importlib.resources.files("plotlines.test.data").joinpath("fruition-revisit.toml").read_text()
+        self.doc = Document.loads(self.text)
+        self.board = self.doc.board
+
+    def changed(self, text: str) -> set[str]:
+        "The uids of the tables which differ between the original text and this one."
+        old = tomllib.loads(self.text)["board"]
+        new = tomllib.loads(text)["board"]
+        return {
+            item["uid"]
+            for key in ("nodes", "edges")
+            for item in new.get(key, [])
+            if item not in old.get(key, [])
+        }
+
+    def test_unchanged(self):
+        self.assertEqual(self.doc.dumps(), self.text)
+
+    def test_comments_kept(self):
+        text = self.text.replace("[[board.edges]]", "# Edges follow\n[[board.edges]]", 1)
+        doc = Document.loads(text)
+        node = next(i for i in doc.board.items if isinstance(i, Node))
+        node.translate(Coordinates(1, 1))
+        self.assertIn("# Edges follow\n", doc.dumps())
+
+    def test_translate(self):
+        node = self.board.items[2]
+        node.translate(Coordinates(1, 2))
+        stream = io.StringIO()
+        self.assertEqual(self.doc.save(stream), len(stream.getvalue()))
+        text = stream.getvalue()
+        self.assertEqual(text, "\n".join(self.board.toml()))
+        self.assertIn(str(node.uid), self.changed(text))
+        self.assertLessEqual(self.changed(text), {str(node.uid)} | {str(edge.uid) for edge in node.edges})
+
+        # Lines which did not change are left alone
+        diff = [line for line in difflib.ndiff(self.text.splitlines(), text.splitlines()) if line[:1] in "+-"]
+        self.assertLess(len(diff), 4 * (len(node.ports) + 2))
+        self.assertFalse(self.board.store.unsaved)
+
+    def test_touch(self):
+        edge = next(i for i in self.board.items if isinstance(i, Edge))
+        edge.label = "Changed"
+        self.assertEqual(self.doc.dumps(), self.text)
+
+        self.board.store.touch(edge.uid)
+        text = self.doc.dumps()
+        self.assertEqual(self.changed(text), {str(edge.uid)})
+        self.assertIn('label       = "Changed"', text)
+
+    def test_add(self):
+        first = self.board.items[0]
+        with self.board:
+            node = Node(label="New", pos=(10, 10))
+        self.board.extend([node])
+        edge = first.connect(node, label="Onward")
+        self.board.items.append(edge)
+
+        text = self.doc.dumps()
+        self.assertEqual(text, "\n".join(self.board.toml()))
+        data = tomllib.loads(text)["board"]
+        self.assertEqual(data["nodes"][-1]["label"], "New")
+        self.assertEqual(data["edges"][-1]["label"], "Onward")
+        self.assertEqual(self.changed(text), {str(first.uid), str(node.uid), str(edge.uid)})
+
+    def test_remove(self):
+        edge = next(i for i in reversed(self.board.items) if isinstance(i, Edge))
+        self.board.items.remove(edge)
+        data = tomllib.loads(self.doc.dumps())["board"]
+        self.assertNotIn(str(edge.uid), {i["uid"] for i in data["edges"]})
+        self.assertEqual(len(data["edges"]), len([i for i in self.board.items if isinstance(i, Edge)]))
+
+    def test_shapes(self):
+        self.board.shapes["square"] = Shape("square", ((0, 0), (0, 1), (1, 1), (1, 0)))
+        data = tomllib.loads(self.doc.dumps())["board"]
+        self.assertEqual(data["shapes"], {"square": [[0, 0], [0, 1], [1, 1], [1, 0]]})
+
+    def test_layout(self):
+        layout = Layout(self.board)
+        layout.layout(layout.size, mode="layered")
+        self.assertTrue(self.board.store.unsaved)
+        text = self.doc.dumps()
+        self.assertEqual(tomllib.loads(text), tomllib.loads("\n".join(self.board.toml())))
+
+
+class ReloadTests(unittest.TestCase):
+
+    def setUp(self):
+        self.text = importlib.resources.files("plotlines.test.data").joinpath("fruition-revisit.toml").read_text()
+        self.doc = Document.loads(self.text)
+        self.board = self.doc.board
+        self.board.store.dirty.clear()
+
+    def adjacency(self):
+        store = self.board.store
+        return [{k: list(v) for k, v in index.items() if v} for index in (store.inbound, store.outbound)]
+
+    def test_unchanged(self):
+        items = list(self.board.items)
+        self.assertEqual(self.doc.reload(self.text), [])
+        self.assertEqual(self.board.items, items)
+        self.assertTrue(all(a is b for a, b in zip(self.board.items, items)))
+
+    def test_contents(self):
+        node = self.board.items[1]
+        text = self.text.replace('contents    = ["elaboration"]', 'contents    = ["elaborate"]')
+        self.assertNotEqual(text, self.text)
+        items = list(self.board.items)
+        adjacency = self.adjacency()
+
+        rv = self.doc.reload(text)
+        self.assertEqual(len(rv), 1)
+        self.assertEqual(rv[0].uid, node.uid)
+        self.assertEqual(rv[0].contents, ["elaborate"])
+        self.assertIs(self.board.items[1], rv[0])
+        self.assertIs(self.board.store[node.uid], rv[0])
+        self.assertTrue(all(a is b for a, b in zip(self.board.items, items) if a.uid != node.uid))
+
+        self.assertEqual(self.adjacency(), adjacency)
+        self.assertEqual([i.uid for i in rv[0].edges], [i.uid for i in node.edges])
+        self.assertIn(node.uid, self.board.store.dirty)
+        self.assertFalse(self.board.store.unsaved)
+        self.assertEqual(self.doc.dumps(), text)
+
+    def test_joins(self):
+        edge = next(i for i in self.board.items if isinstance(i, Edge))
+        src, dst = self.board.store.ends(edge)
+        other = next(i for i in self.board.items if isinstance(i, Node) and i.uid not in (*src, *dst))
+        chunks, kinds = Document.divide(self.text)
+        n = self.doc.index[edge.uid]
+        chunks[n] = chunks[n].replace(format(next(iter(dst))), format(other.uid))
+        text = "".join(chunks)
+
+        rv = self.doc.reload(text)
+        self.assertEqual([i.uid for i in rv], [edge.uid])
+        self.assertIn(edge.uid, self.board.store.inbound[other.uid])
+        self.assertNotIn(edge.uid, self.board.store.inbound.get(next(iter(dst)), ()))
+
+        expected = Document.loads(text).board
+        self.assertEqual(set(self.board.store.initial), set(expected.store.initial))
+        self.assertEqual(set(self.board.store.terminal), set(expected.store.terminal))
+        self.assertEqual(
+            [{k: set(v) for k, v in index.items() if v} for index in (self.board.store.inbound, self.board.store.outbound)],
+            [{k: set(v) for k, v in index.items() if v} for index in (expected.store.inbound, expected.store.outbound)],
+        )
+
+    def test_head(self):
+        self.board.shapes["square"] = Shape("square", ((0, 0), (0, 1), (1, 1), (1, 0)))
+        text = self.doc.dumps()
+        self.assertEqual(Document.loads(text).board.shapes, self.board.shapes)
+
+        items = list(self.board.items)
+        text = text.replace('"square" = [[0, 0], [0, 1], [1, 1], [1, 0]]', '"square" = [[0, 0], [0, 2], [2, 2], [2, 0]]')
+        text = text.replace("[board]\n", '[board]\ntitle = "Revisited"\n', 1)
+        self.assertEqual(self.doc.reload(text), [])
+        self.assertEqual(self.board.items, items)
+        self.assertEqual(self.board.title, "Revisited")
+        self.assertEqual(self.board.shapes, {"square": Shape("square", ((0, 0), (0, 2), (2, 2), (2, 0)))})
+        self.assertEqual(self.doc.dumps(), text)
+
+    def test_remove_and_add(self):
+        chunks, kinds = Document.divide(self.text)
+        n = kinds.index(Edge)
+        removed = tomllib.loads(chunks[n])["board"]["edges"][0]["uid"]
+        added = chunks[n].replace(removed, "7f0c6a47-50d4-4f7e-9d5b-4c7cc1a0d5a1")
+        text = "".join(chunks[:n] + chunks[n + 1:] + ["\n", added])
+
+        rv = self.doc.reload(text)
+        self.assertEqual([format(i.uid) for i in rv], ["7f0c6a47-50d4-4f7e-9d5b-4c7cc1a0d5a1"])
+        uids = {format(i.uid) for i in self.board.items}
+        self.assertNotIn(removed, uids)
+        self.assertIn("7f0c6a47-50d4-4f7e-9d5b-4c7cc1a0d5a1", uids)
+        self.assertFalse(any(removed in map(format, v) for v in self.board.store.outbound.values()))
+        self.assertEqual(len(self.board.items), len(Document.loads(text).board.items))
@@ -0,0 +1,67 @@
+#! /usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of Plotlines.
+
+# Plotlines is free software: You can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+
+# Plotlines is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the
+# GNU General Public License along with Plotlines.
+# If not, see <https://www.gnu.org/licenses/>.
+
+import importlib.resources
+import unittest
+import xml.etree.ElementTree as ET
+
+from plotlines.board import Board
+from plotlines.board import Graph
+from plotlines.board import Node
+from plotlines.layered import Layered
+from plotlines.layout import Layout
+
+
+class LayeredTests(unittest.TestCase):
+
+    def test_crossings(self):
+        a, b = Node(zone=0), Node(zone=0)
+        c, d = Node(zone=1), Node(zone=1)
+        edges = [a.connect(d), b.connect(c)]
+        layered = Layered(Graph.build([a, b, c, d] + edges))
+        neighbours = layered.neighbours()
+        self.assertEqual(layered.crossings([0, 1], [2, 3], neighbours), 1)
+        self.assertEqual(layered.crossings([0, 1], [3, 2], neighbours), 0)
+
+        self.assertEqual(layered.order(), [[0, 1], [3, 2]])
+        self.assertEqual(layered.record, [1, 0])
+
+    def test_columns(self):
+        nodes = [Node(zone=n // 2, area=4) for n in range(6)]
+        edges = [a.connect(b) for a, b in zip(nodes, nodes[2:])]
+        graph = Layered(Graph.build(nodes + edges))()
+        self.assertEqual(graph.x[0], graph.x[1])
+        self.assertLess(graph.x[1], graph.x[2])
+        self.assertLess(graph.x[3], graph.x[4])
+        self.assertNotEqual(graph.y[0], graph.y[1])
+
+    def test_layout_layered(self):
+        text = importlib.resources.files("plotlines.test.data").joinpath("spiki-demo_n51.svg").read_text()
+        board = Board()
+        board.merge(ET.fromstring(text))
+        for node in (i for i in board.items if isinstance(i, Node)):
+            node.zone = node.id % 4
+            node.pos = None
+
+        layout = Layout(board)
+        items = layout.layout(layout.size, mode="layered", method="barycenter")
+        nodes = [i for i in items if isinstance(i, Node)]
+        self.assertTrue(all(i.pos for i in nodes))
+        self.assertTrue(all(p.pos for i in nodes for p in i.ports.values()))
+        self.assertEqual(len({i.pos for i in nodes}), len(nodes))
@@ -0,0 +1,149 @@
+#! /usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of Plotlines.
+
+# Plotlines is free software: You can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+
+# Plotlines is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the
+# GNU General Public License along with Plotlines.
+# If not, see <https://www.gnu.org/licenses/>.
+
+import itertools
+import statistics
+import subprocess
+import sys
+import tomllib
+import unittest
+
+from plotlines.board import Board
+from plotlines.board import Edge
+from plotlines.board import Grid
+from plotlines.board import Node
+from plotlines.coordinates import Coordinates as C
+from plotlines.layout import Iteration
+from plotlines.layout import Layout
+from plotlines.layout import Shape
+from plotlines.test import test_board
+
+
+class LayoutTests(unittest.TestCase):
+
+    def test_no_turtle(self):
+        code = "import sys, plotlines.layout; sys.exit('turtle' in sys.modules or 'tkinter' in sys.modules)"
+        rv = subprocess.run([sys.executable, "-c", code])
+        self.assertEqual(rv.returncode, 0)
+
+    def test_3_nodes_style(self):
+        nodes, edges = test_board.BoardTests.build_3_nodes()
+        board = Board(items=nodes + edges)
+        layout = Layout(board)
+
+        frame, scale = layout.style_items(board.items, size=(400, 300))
+        self.assertTrue(all(i.shape == "sq40.00x40.00-273/100" for i in nodes), board.shapes)
+        self.assertEqual(len(board.shapes), 1)
+
+        shape = board.shapes[nodes[0].shape]
+        self.assertIsInstance(shape, Shape)
+        self.assertEqual(len(shape.data), 4)
+
+        data = tomllib.loads("\n".join(board.toml()))
+        self.assertEqual(data["board"]["shapes"][shape.key], [list(i) for i in shape.data])
+
+    def test_build_graph_ports(self):
+        with Board() as board:
+            graph = Layout.build_graph(limit=100, ending=3, steps=400, exits=2)
+            # Well past the limit, where each step is cut short
+            items = list(itertools.islice(graph, 130))
+        ports = [port for item in items if isinstance(item, Node) for port in item.ports.values()]
+        for port in ports:
+            with self.subTest(port=port):
+                self.assertTrue(any(isinstance(board.store.get(uid), Edge) for uid in port.joins))
+        graph.close()
+
+    def test_layout_board(self):
+        with Board() as board:
+            items = list(Layout.build_graph(limit=40, ending=3, steps=4, exits=2))
+        board.extend(items)
+
+        layout = Layout(board)
+        rv = layout.layout_board(layout.size)
+        self.assertIs(rv, layout.record)
+        frame, scale = layout.style_items(board.items)
+        self.assertTrue(all(i.pos for i in board.items if isinstance(i, Node)))
+        self.assertTrue(all(i.shape in board.shapes for i in board.items if isinstance(i, Node)))
+
+    def test_layout_board_record(self):
+        with Board() as board:
+            items = list(Layout.build_graph(limit=40, ending=3, steps=4, exits=2))
+        board.extend(items)
+
+        layout = Layout(board)
+        rv = layout.layout_board(layout.size, threshold=1000, limit=4)
+        self.assertEqual([i.step for i in rv], [0, 1, 2, 3, 4])
+        self.assertTrue(all(isinstance(i, Iteration) for i in layout.record))
+        self.assertEqual(layout.record[0].moved, 0)
+        self.assertTrue(all(i.moved for i in layout.record[1:]))
+
+        best = max(statistics.median(i.crowding.values()) for i in layout.record)
+        nodes = [i for i in board.items if isinstance(i, Node)]
+        groups = {}
+        for node in nodes:
+            groups.setdefault(node.zone, []).append(node)
+        grid = Grid.build(board.items)
+        self.assertEqual(statistics.median(Layout.crowding(zone, grid) for zone in groups.values()), best)
+
+    def test_layout_board_budget(self):
+        with Board() as board:
+            items = list(Layout.build_graph(limit=40, ending=3, steps=4, exits=2))
+        board.extend(items)
+
+        layout = Layout(board)
+        layout.layout_board(layout.size, threshold=1000, budget=0)
+        self.assertEqual(len(layout.record), 1)
+
+    def test_relayout(self):
+        with Board() as board:
+            items = list(Layout.build_graph(limit=40, ending=3, steps=4, exits=2))
+        board.extend(items)
+
+        layout = Layout(board)
+        layout.layout_board(layout.size)
+        self.assertFalse(board.store.dirty)
+        self.assertEqual(layout.relayout(layout.size), board.items)
+        self.assertFalse(layout.record)
+
+        nodes = [i for i in board.items if isinstance(i, Node)]
+        source = nodes[-1]
+        with board:
+            node = Node(zone=source.zone)
+            edge = source.connect(node)
+        board.extend([node, edge])
+        self.assertEqual(set(board.store.dirty), {source.uid, node.uid})
+
+        touched = {source.zone} | {i.zone for i in source.nearby}
+        pinned = {i.uid: i.pos for i in nodes if i.zone not in touched}
+        self.assertTrue(pinned)
+
+        layout.relayout(layout.size)
+        self.assertFalse(board.store.dirty)
+        self.assertTrue(node.pos)
+        self.assertTrue(all(p.pos for p in node.ports.values()))
+        self.assertEqual({i.uid: i.pos for i in nodes if i.uid in pinned}, pinned)
+
+    def test_dirty(self):
+        nodes, edges = test_board.BoardTests.build_3_nodes()
+        board = Board(items=nodes + edges)
+        board.store.dirty.clear()
+        nodes[1].translate(C(0, 10))
+        self.assertEqual(list(board.store.dirty), [nodes[1].uid])
+        nodes[2].connect(nodes[0])
+        self.assertEqual(list(board.store.dirty), [nodes[1].uid, nodes[2].uid, nodes[0].uid])
@@ -0,0 +1,74 @@
+#! /usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of Plotlines.
+
+# Plotlines is free software: You can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+
+# Plotlines is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the
+# GNU General Public License along with Plotlines.
+# If not, see <https://www.gnu.org/licenses/>.
+
+import importlib.resources
+import math
+import unittest
+import xml.etree.ElementTree as ET
+
+from plotlines.board import Board
+from plotlines.board import Graph
+from plotlines.board import Node
+from plotlines.layout import Layout
+from plotlines.multilevel import Multilevel
+
+
+class MultilevelTests(unittest.TestCase):
+
+    @staticmethod
+    def build_chain(length=4):
+        nodes = [Node(area=4, zone=n) for n in range(length)]
+        edges = [a.connect(b) for a, b in zip(nodes, nodes[1:])]
+        return nodes, edges
+
+    def test_coarsen(self):
+        nodes, edges = self.build_chain(6)
+        engine = Multilevel(Graph.build(nodes + edges), seed=1)
+        parent, count, edges, zone, mass = engine.coarsen(6, engine.edges(), list(range(6)), [1.0] * 6)
+        self.assertEqual(len(parent), 6)
+        self.assertLess(count, 6)
+        self.assertEqual(sum(mass), 6)
+        self.assertTrue(all(0 <= a < b < count for a, b in edges))
+
+    def test_levels(self):
+        nodes, edges = self.build_chain(64)
+        engine = Multilevel(Graph.build(nodes + edges), coarsest=8, iterations=8, seed=1)
+        graph = engine()
+        sizes = [size for size, moved in engine.record]
+        self.assertEqual(sizes[-1], 64)
+        self.assertLessEqual(sizes[0], 8)
+        self.assertEqual(sizes, sorted(sizes))
+
+        lengths = [math.dist((graph.x[a], graph.y[a]), (graph.x[b], graph.y[b])) for a, b in engine.edges()]
+        self.assertLess(max(lengths), 4 * engine.length)
+        self.assertGreater(min(lengths), 0)
+
+    def test_layout_multilevel(self):
+        text = importlib.resources.files("plotlines.test.data").joinpath("spiki-demo_n51.svg").read_text()
+        board = Board()
+        board.merge(ET.fromstring(text))
+        for node in (i for i in board.items if isinstance(i, Node)):
+            node.pos = None
+
+        layout = Layout(board)
+        items = layout.layout(layout.size, mode="multilevel", seed=1)
+        nodes = [i for i in items if isinstance(i, Node)]
+        self.assertTrue(all(i.pos for i in nodes))
+        self.assertTrue(all(p.pos for i in nodes for p in i.ports.values()))
+        self.assertEqual(len({i.pos for i in nodes}), len(nodes))
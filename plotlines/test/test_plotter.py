@@ -19,6 +19,7 @@ from collections import defaultdict
 from decimal import Decimal
 from fractions import Fraction
 import itertools
+import random
 import sys
 import textwrap
 import tkinter as tk
@@ -28,9 +29,11 @@ import unittest
 
 from plotlines.board import Board
 from plotlines.board import Edge
+from plotlines.board import Graph
 from plotlines.board import Node
 from plotlines.board import Port
 from plotlines.coordinates import Coordinates as C
+from plotlines.layout import Layout
 from plotlines.plotter import Plotter
 from plotlines.test.test_board import BoardTests
 
@@ -64,7 +67,7 @@ class PlotterTests(unittest.TestCase):
         board = Board(items=items)
         plotter = Plotter(board, t=turtle.Turtle())
         size = plotter.turtle.screen.screensize()
-        items = plotter.layout_board(size)
+        record = plotter.layout_board(size)
         frame, scale = plotter.style_items(board.items, size=size)
         rv = plotter.draw_items(board.items, debug=True, delay=0)
         plotter.turtle.screen.mainloop()
@@ -84,6 +87,26 @@ class PlotterTests(unittest.TestCase):
             self.assertEqual(len(board.shapes), 1, board.shapes)
             self.assertEqual(len(plotter.stamps), len(nodes), plotter.stamps)
 
+    def test_generated_draw(self):
+        state = random.getstate()
+        random.seed(3)
+        try:
+            with Board() as board:
+                items = list(Layout.build_graph(limit=200, ending=4, steps=20, exits=4))
+        finally:
+            random.setstate(state)
+        board.extend(items)
+
+        mock_screen = self.build_screen()
+        with unittest.mock.patch.object(turtle.Turtle, "_screen", mock_screen):
+            plotter = Plotter(board, turtle.Turtle())
+            plotter.layout_board(plotter.size)
+            plotter.style_items(board.items)
+            plotter.draw_items(board.items)
+
+        nodes = {node.uid for i in items if isinstance(i, Edge) for node in i.joins}
+        self.assertEqual(len(plotter.stamps), len(nodes))
+
     @unittest.skip("Dev quicker without GUI")
     def test_style_graph(self):
         nodes = [
@@ -134,6 +157,31 @@ class PlotterTests(unittest.TestCase):
         even = list(Plotter.expandex(6))
         self.assertEqual(even, [3, 2, 4, 1, 5, 0])
 
+    def test_place_items_graph(self):
+        items = list(Plotter.build_graph(limit=40, ending=3, steps=4, exits=2))
+        boundary = [C(0, 0), C(0, 400), C(300, 0), C(400, 300)]
+        check = {
+            zone: [(node.pos, [p.pos for p in node.ports.values()]) for node in nodes]
+            for zone, nodes in Plotter.place_items(items, boundary=boundary)
+        }
+        for node in (i for i in items if isinstance(i, Node)):
+            for pin in [node, *node.ports.values()]:
+                pin.pos = None
+
+        graph = Graph.build(items)
+        zones = dict(Plotter.place_items(graph, boundary=boundary))
+        self.assertEqual(list(zones), list(check))
+        for zone, nodes in zones.items():
+            with self.subTest(zone=zone):
+                for node, (pos, ports) in zip(nodes, check[zone]):
+                    self.assertAlmostEqual(abs(node.pos - pos), 0)
+                    for port, other in zip(node.ports.values(), ports):
+                        if other is None:
+                            # The Port of an Edge which was not yielded is placed by neither
+                            self.assertIsNone(port.pos)
+                        else:
+                            self.assertAlmostEqual(abs(port.pos - other), 0)
+
     def test_build_graph_minimal(self):
         witness = defaultdict(list)
         for i in Plotter.build_graph(limit=7, ending=3, steps=1, exits=3):
@@ -182,6 +230,8 @@ class PlotterTests(unittest.TestCase):
 
             self.assertLessEqual(len(board.terminal), 4)
             self.assertLessEqual(sum(len(i) for i in witness.values()), 110)
+            self.assertEqual(len({i.name for i in board.items}), len(board.items))
+            self.assertTrue(all(i.id for i in board.items))
         except AssertionError:
             self.display_items(board.items)
             print(*board.toml(), sep="\n", file=sys.stderr)
@@ -0,0 +1,204 @@
+#! /usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of Plotlines.
+
+# Plotlines is free software: You can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+
+# Plotlines is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the
+# GNU General Public License along with Plotlines.
+# If not, see <https://www.gnu.org/licenses/>.
+
+import importlib.resources
+import datetime
+import io
+import pathlib
+import tempfile
+import tomllib
+import unittest
+import xml.etree.ElementTree as ET
+
+from plotlines.board import Board
+from plotlines.board import Edge
+from plotlines.board import Node
+from plotlines.layout import Layout
+from plotlines.snapshot import Mapped
+from plotlines.snapshot import Snapshot
+from plotlines.tree import Tree
+
+
+class SnapshotTests(unittest.TestCase):
+
+    def round_trip(self, board: Board) -> Board:
+        stream = io.BytesIO()
+        size = Snapshot.build(board).dump(stream)
+        self.assertEqual(size, len(stream.getvalue()))
+        stream.seek(0)
+        return Snapshot.load(stream)
+
+    def test_toml(self):
+        text = importlib.resources.files("plotlines.test.data").joinpath("fruition-revisit.toml").read_text()
+        board = Board.build(tomllib.loads(text))
+        rv = self.round_trip(board)
+        self.assertEqual("\n".join(rv.toml()), "\n".join(board.toml()))
+        self.assertEqual(len(rv.items), len(board.items))
+        self.assertEqual(rv.initial, [rv.store[i.uid] for i in board.initial])
+
+    def test_svg(self):
+        text = importlib.resources.files("plotlines.test.data").joinpath("spiki-demo_n51.svg").read_text()
+        board = Board()
+        board.merge(ET.fromstring(text))
+        rv = self.round_trip(board)
+        self.assertEqual("\n".join(rv.toml()), "\n".join(board.toml()))
+
+    def test_large_int(self):
+        with Board() as board:
+            node = Node(pos=(2 ** 53 + 1, -(2 ** 62)), area=2 ** 63 - 1)
+            edge = node.connect(node)
+        board.extend([node, edge])
+        rv = self.round_trip(board)
+        self.assertEqual(rv.store[node.uid].pos, node.pos)
+        self.assertEqual(rv.store[node.uid].area, node.area)
+        self.assertEqual(rv.store[edge.uid].ends, ([rv.store[node.uid]], [rv.store[node.uid]]))
+
+    def test_generated(self):
+        with Board() as board:
+            items = list(Layout.build_graph(limit=80, ending=3, steps=8, exits=2))
+        board.extend(items)
+        layout = Layout(board)
+        layout.layout_board(layout.size)
+        layout.style_items(board.items)
+        self.assertTrue(board.shapes)
+
+        rv = self.round_trip(board)
+        self.assertEqual(rv.shapes, board.shapes)
+        self.assertEqual("\n".join(rv.toml()), "\n".join(board.toml()))
+
+    def test_joins_order(self):
+        # Joins are kept in the order they were made, but written sorted
+        edge = Edge()
+        rv = []
+        for order in ([3, 11], [11, 3]):
+            edge.ports[0].joins = (*order, edge.uid)
+            stream = io.BytesIO()
+            Snapshot.build(Board(items=[edge])).dump(stream)
+            rv.append(("\n".join(edge.toml()), stream.getvalue()))
+        self.assertEqual(rv[0], rv[1])
+
+    def test_not_snapshot(self):
+        with self.assertRaises(ValueError):
+            Snapshot.read(io.BytesIO(b"[board]\n"))
+
+    def test_truncated(self):
+        text = importlib.resources.files("plotlines.test.data").joinpath("fruition-revisit.toml").read_text()
+        stream = io.BytesIO()
+        Snapshot.build(Board.build(tomllib.loads(text))).dump(stream)
+        data = stream.getvalue()
+        for size in (8, 12, 20, len(data) - 3):
+            with self.subTest(size=size), self.assertRaises(ValueError):
+                Snapshot.read(io.BytesIO(data[:size]))
+
+
+class MappedTests(unittest.TestCase):
+
+    def setUp(self):
+        text = importlib.resources.files("plotlines.test.data").joinpath("fruition-revisit.toml").read_text()
+        self.board = Board.build(tomllib.loads(text))
+        self.temp = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.temp.name).joinpath("board.snap")
+        with self.path.open("wb") as output:
+            Snapshot.build(self.board).dump(output)
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def test_handles(self):
+        with Mapped(self.path) as mapped:
+            self.assertEqual(len(mapped.items), len(self.board.items))
+            for handle, item in zip(mapped.items, self.board.items):
+                with self.subTest(item=item):
+                    self.assertIsInstance(handle, type(item))
+                    self.assertEqual(handle.uid, item.uid)
+                    self.assertEqual(handle.name, item.name)
+                    self.assertEqual(handle.label, item.label)
+                    self.assertEqual(handle.title, item.title)
+                    self.assertEqual(handle.contents, item.contents)
+            self.assertFalse(mapped.made)
+
+    def test_adjacency(self):
+        with Mapped(self.path) as mapped:
+            nodes = [i for i in self.board.items if isinstance(i, Node)]
+            for handle, node in zip(mapped.nodes, nodes):
+                with self.subTest(node=node):
+                    self.assertEqual(
+                        [[e.uid for e in group] for group in handle.connections],
+                        [[e.uid for e in group] for group in node.connections],
+                    )
+            self.assertEqual({i.uid for i in mapped.initial}, {i.uid for i in self.board.initial})
+            self.assertEqual({i.uid for i in mapped.terminal}, {i.uid for i in self.board.terminal})
+
+    def test_materialize(self):
+        with Mapped(self.path) as mapped:
+            handle = mapped.edges[0]
+            edge = self.board.store[handle.uid]
+            self.assertEqual([p.uid for p in handle.ports], [p.uid for p in edge.ports])
+            self.assertIsInstance(handle.item, Edge)
+            self.assertIs(handle.item, mapped.materialize(handle))
+            self.assertEqual(len(mapped.made), 1)
+
+    def test_tree(self):
+        ts = datetime.datetime.now(tz=datetime.timezone.utc)
+        parent = pathlib.Path(self.temp.name)
+        with Mapped(self.path) as mapped:
+            rv = {path: text for text, path in Tree(mapped)(parent, ts=ts)}
+            self.assertFalse(mapped.made)
+        expected = {path: text for text, path in Tree(self.board)(parent, ts=ts)}
+        self.assertEqual(rv.keys(), expected.keys())
+        for path, text in expected.items():
+            self.assertEqual(rv[path], text, path)
+
+    def test_tree_initial(self):
+        # Edges made in reverse, so that the Registry finds the initial Nodes out of order
+        with Board() as board:
+            nodes = [Node(label=label) for label in "abcd"]
+            edges = [node.connect(nodes[-1]) for node in reversed(nodes[:-1])]
+        board.extend(nodes + edges)
+        self.assertEqual(board.store.initial, {node.uid: None for node in reversed(nodes[:-1])})
+        with self.path.open("wb") as output:
+            Snapshot.build(board).dump(output)
+
+        ts = datetime.datetime.now(tz=datetime.timezone.utc)
+        parent = pathlib.Path(self.temp.name)
+        with Mapped(self.path) as mapped:
+            rv = {path: text for text, path in Tree(mapped)(parent, ts=ts)}
+        expected = {path: text for text, path in Tree(board)(parent, ts=ts)}
+        self.assertEqual(rv, expected)
+
+    def test_close(self):
+        mapped = Mapped(self.path)
+        handle = mapped.nodes[0]
+        mapped.close()
+        self.assertFalse(mapped.sections)
+        self.assertTrue(mapped.map.closed)
+        with self.assertRaises(KeyError):
+            handle.id
+
+    def test_not_snapshot(self):
+        self.path.write_text("[board]\n")
+        with self.assertRaises(ValueError):
+            Mapped(self.path)
+
+    def test_truncated(self):
+        data = self.path.read_bytes()
+        for size in (12, 20, len(data) - 3):
+            with self.subTest(size=size), self.assertRaises(ValueError):
+                self.path.write_bytes(data[:size])
+                Mapped(self.path)
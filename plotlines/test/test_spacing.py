@@ -0,0 +1,111 @@
+#! /usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of Plotlines.
+
+# Plotlines is free software: You can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+
+# Plotlines is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the
+# GNU General Public License along with Plotlines.
+# If not, see <https://www.gnu.org/licenses/>.
+
+import math
+import unittest.mock
+
+from plotlines.board import Board
+from plotlines.board import Grid
+from plotlines.board import Node
+from plotlines.coordinates import Coordinates as C
+from plotlines.layout import Layout
+from plotlines.spacing import Spacing
+from plotlines.spacing import numpy
+from plotlines.test import test_board
+
+
+class SpacingTests(unittest.TestCase):
+
+    def test_3_nodes_matrix(self):
+        nodes, edges = test_board.BoardTests.build_3_nodes()
+        spacing = Spacing(nodes[:1], nodes[1:2], vectorize=False)
+        self.assertEqual(len(spacing.rows), 2)
+        self.assertEqual(len(spacing.cols), 3)
+        rv = spacing.matrix()
+        self.assertEqual(sorted(i for row in rv for i in row), sorted(nodes[0].spacing(nodes[1]).values()))
+
+    def test_3_nodes_offsets(self):
+        nodes, edges = test_board.BoardTests.build_3_nodes()
+        nodes[0].translate(C(0, 30))
+        spacing = Spacing(nodes[:1], edges[1:], vectorize=False)
+        self.assertEqual(spacing.offsets(), [[30], [30]])
+        self.assertEqual(spacing.nearest(), [30, 30])
+        self.assertEqual(spacing.minimum(), 30)
+
+    def test_empty(self):
+        self.assertEqual(Spacing([]).minimum(), math.inf)
+        self.assertEqual(Spacing([Node((0, 0))]).nearest(), [math.inf])
+
+    @unittest.skipUnless(numpy, "Needs numpy")
+    def test_vectorized(self):
+        nodes, edges = test_board.BoardTests.build_3_nodes()
+        nodes[0].translate(C(0, 30))
+        for others in (nodes, nodes + edges, edges):
+            with self.subTest(others=len(others)):
+                check = Spacing(nodes, others, vectorize=False)
+                spacing = Spacing(nodes, others, vectorize=True)
+                self.assertEqual(spacing.matrix().tolist(), check.matrix())
+                self.assertEqual(spacing.nearest(), check.nearest())
+
+    def test_indexed(self):
+        nodes, edges = test_board.BoardTests.build_3_nodes()
+        nodes[0].translate(C(0, 30))
+        # The Grid leaves out the last Node, whose points are then measured directly
+        grid = Grid.build(nodes[:2])
+        for others in (nodes, nodes + edges, edges):
+            with self.subTest(others=len(others)):
+                check = Spacing(nodes, others, vectorize=False)
+                spacing = Spacing(nodes, others, vectorize=False, grid=grid)
+                self.assertEqual(spacing.nearest(), check.nearest())
+
+    def test_crowding_indexed(self):
+        with Board() as board:
+            items = list(Layout.build_graph(limit=40, ending=3, steps=4, exits=2))
+        board.extend(items)
+        layout = Layout(board)
+        boundary = [C(0, 0), C(0, layout.size[0]), C(layout.size[1], 0), C(*layout.size)]
+        zones = dict(layout.place_items(board.items, boundary=boundary))
+        grid = Grid.build(board.items)
+        for zone, nodes in zones.items():
+            with self.subTest(zone=zone), unittest.mock.patch("plotlines.spacing.numpy", None):
+                self.assertAlmostEqual(Layout.crowding(nodes, grid), Layout.crowding(nodes))
+
+    def test_crowding_neighbours(self):
+        # Nodes of a zone which are not joined are not measured against each other
+        with Board() as board:
+            zone = [Node((0, 0)), Node((1, 0))]
+            others = [Node((0, 50)), Node((1, 50))]
+            edges = [a.connect(b) for a, b in zip(zone, others)]
+        board.extend(zone + others + edges)
+        grid = Grid.build(board.items)
+        for vectorize in (False, True):
+            with self.subTest(vectorize=vectorize), unittest.mock.patch("plotlines.spacing.numpy", numpy if vectorize else None):
+                self.assertEqual(Layout.crowding(zone), 50)
+                self.assertEqual(Layout.crowding(zone, grid), 50)
+
+    def test_layout_board(self):
+        with Board() as board:
+            items = list(Layout.build_graph(limit=40, ending=3, steps=4, exits=2))
+        board.extend(items)
+
+        layout = Layout(board)
+        rv = layout.layout_board(layout.size, index=False)
+        self.assertTrue(rv)
+        self.assertTrue(all(i.pos for i in board.items if isinstance(i, Node)))
+        self.assertIsNone(board.store.grid)
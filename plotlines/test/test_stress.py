@@ -0,0 +1,109 @@
+#! /usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of Plotlines.
+
+# Plotlines is free software: You can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+
+# Plotlines is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the
+# GNU General Public License along with Plotlines.
+# If not, see <https://www.gnu.org/licenses/>.
+
+import importlib.resources
+import itertools
+import math
+import unittest
+import xml.etree.ElementTree as ET
+
+from plotlines.board import Board
+from plotlines.board import Graph
+from plotlines.board import Node
+from plotlines.layout import Layout
+from plotlines.schema import OptimizationMethod
+from plotlines.stress import Stress
+from plotlines.stress import numpy
+
+
+class StressTests(unittest.TestCase):
+
+    @staticmethod
+    def build_chain(length=4):
+        nodes = [Node(area=4) for n in range(length)]
+        edges = [a.connect(b) for a, b in zip(nodes, nodes[1:])]
+        return nodes, edges
+
+    def test_hops(self):
+        nodes, edges = self.build_chain()
+        stress = Stress(Graph.build(nodes + edges + [Node()]))
+        rv = stress.hops()
+        self.assertEqual(list(rv[0]), [0, 1, 2, 3, math.inf])
+        self.assertEqual(list(rv[2]), [2, 1, 0, 1, math.inf])
+
+        rv = stress.distances()
+        self.assertEqual(list(rv[0]), [0, 4, 8, 12, 16])
+
+    def test_chain(self):
+        nodes, edges = self.build_chain()
+        stress = Stress(Graph.build(nodes + edges), seed=1, vectorize=False)
+        graph = stress()
+        self.assertLess(stress.record[-1], stress.record[0])
+
+        graph.write()
+        for (a, b), check in (((0, 1), 4), ((0, 2), 8), ((1, 3), 8)):
+            with self.subTest(a=a, b=b):
+                self.assertAlmostEqual(abs(nodes[a].pos - nodes[b].pos), check, delta=0.2)
+
+    @unittest.skipUnless(numpy, "Needs numpy")
+    def test_chain_vectorized(self):
+        nodes, edges = self.build_chain()
+        graph = Stress(Graph.build(nodes + edges), seed=1, vectorize=True)()
+        graph.write()
+        self.assertAlmostEqual(abs(nodes[0].pos - nodes[3].pos), 12, delta=0.5)
+
+    def test_few_nodes(self):
+        for n, vectorize in itertools.product((0, 1), (False, True)):
+            with self.subTest(n=n, vectorize=vectorize):
+                nodes = [Node(area=4) for i in range(n)]
+                graph = Stress(Graph.build(nodes), seed=1, vectorize=vectorize)()
+                graph.write()
+                self.assertTrue(all(i.pos for i in nodes))
+
+    def test_default_length(self):
+        nodes, edges = self.build_chain()
+        board = Board(items=nodes + edges)
+        self.assertEqual(Stress.build(board).length, Stress(Graph.build(board.items)).length)
+
+        board.xml_options = dict(board.xml_options)
+        del board.xml_options["defaultIdealConnectorLength"]
+        self.assertEqual(Stress.build(board).length, 2 * 2)
+
+        board.xml_options["defaultIdealConnectorLength"] = 3
+        self.assertEqual(Stress.build(board).length, 3 * 2)
+
+    def test_board_options(self):
+        board = Board()
+        board.xml_options = dict(board.xml_options, layoutMethod=OptimizationMethod.STEEPESTDESCENT)
+        with self.assertRaises(ValueError):
+            Stress.build(board)
+
+    def test_layout_stress(self):
+        text = importlib.resources.files("plotlines.test.data").joinpath("spiki-demo_n51.svg").read_text()
+        board = Board()
+        board.merge(ET.fromstring(text))
+        for node in (i for i in board.items if isinstance(i, Node)):
+            node.pos = None
+
+        layout = Layout(board)
+        items = layout.layout_stress(iterations=20, seed=1, vectorize=False)
+        nodes = [i for i in items if isinstance(i, Node)]
+        self.assertTrue(all(i.pos for i in nodes))
+        self.assertTrue(all(p.pos for i in nodes for p in i.ports.values()))
+        self.assertEqual(len({i.pos for i in nodes}), len(nodes))
@@ -17,8 +17,10 @@
 # GNU General Public License along with Plotlines.
 # If not, see <https://www.gnu.org/licenses/>.
 
+import datetime
 import importlib.resources
 import pathlib
+import random
 import shutil
 import tempfile
 import tomllib
@@ -28,6 +30,7 @@ import xml.etree.ElementTree as ET
 from plotlines.board import Board
 from plotlines.board import Edge
 from plotlines.board import Node
+from plotlines.layout import Layout
 from plotlines.tree import Tree
 
 
@@ -111,3 +114,92 @@ class TreeTests(unittest.TestCase):
         )
 
         self.assertEqual(node["doc"]["html"]["body"]["main"].get("blocks", "").strip(), "First node.")
+
+    def test_sync(self):
+        text = importlib.resources.read_text("plotlines.test.data", "inkscape_properties_n03e02.svg")
+        board = Board()
+        board.merge(ET.fromstring(text))
+        tree = Tree(board)
+        self.parent.joinpath("stale.toml").write_text("")
+
+        rv = tree.sync(self.parent)
+        files = list(tree(self.parent))
+        self.assertEqual(Tree.tally(rv), dict(written=len(files), unchanged=0, deleted=1))
+        self.assertEqual(rv[self.parent.joinpath("stale.toml")], "deleted")
+        self.assertEqual({i.name for i in self.parent.iterdir()}, {path.name for text, path in files})
+
+        # A new timestamp alone does not rewrite the index
+        rv = tree.sync(self.parent)
+        self.assertEqual(Tree.tally(rv), dict(written=0, unchanged=len(files), deleted=0))
+
+        edge = next(i for i in board.items if isinstance(i, Edge))
+        edge.title = "Changed"
+        rv = tree.sync(self.parent)
+        # The Edge, the Node it leaves from, and the index
+        self.assertEqual(Tree.tally(rv)["written"], 3)
+        self.assertIn("Changed", self.parent.joinpath(edge.name).with_suffix(".toml").read_text())
+
+    def test_emit(self):
+        text = importlib.resources.read_text("plotlines.test.data", "spiki-demo_n51.svg")
+        board = Board()
+        board.merge(ET.fromstring(text))
+        tree = Tree(board)
+        ts = datetime.datetime.now(tz=datetime.timezone.utc)
+        expected = list(tree(self.parent, ts=ts))
+
+        rv = tree.emit(self.parent, ts=ts, workers=3)
+        self.assertEqual(list(rv), [path for text, path in expected])
+        self.assertEqual(set(rv.values()), {"written"})
+        for text, path in expected:
+            self.assertEqual(path.read_text(), text)
+
+    def test_emit_errors(self):
+        text = importlib.resources.read_text("plotlines.test.data", "inkscape_properties_n03e02.svg")
+        board = Board()
+        board.merge(ET.fromstring(text))
+        tree = Tree(board)
+        blocked = self.parent.joinpath("index.toml")
+        blocked.mkdir()
+
+        rv = tree.emit(self.parent, workers=2)
+        self.assertIsInstance(rv[blocked], OSError)
+        self.assertEqual(Tree.tally(rv)["failed"], 1)
+        self.assertEqual(Tree.tally(rv)["written"], len(rv) - 1)
+
+    def test_escaping(self):
+        with Board() as board:
+            a = Node(title='Say "hello"', contents=['C:\\path', 'Three """ quotes', "Tab\there"])
+            b = Node(title="Back\\slash")
+            edge = a.connect(b, label='A "quoted" label', title="Line\nbreak")
+        board.extend([a, b, edge])
+        pages = {path.name: tomllib.loads(text) for text, path in Tree(board)(self.parent) if path.suffix == ".toml"}
+
+        page = pages[f"{a.name}.toml"]
+        self.assertEqual(page["metadata"]["title"], 'Say "hello"')
+        self.assertEqual(page["doc"]["html"]["body"]["main"]["blocks"], '\n'.join(a.contents) + "\n")
+        self.assertEqual(page["doc"]["html"]["body"]["footer"]["nav"]["ul"]["li"][0]["a"], "Line\nbreak")
+        self.assertEqual(pages[f"{b.name}.toml"]["metadata"]["title"], "Back\\slash")
+
+        labels = [i["div"]["span"]["a"] for i in pages["index.toml"]["base"]["html"]["body"]["header"]["nav"]["ul"]["li"]]
+        self.assertIn('A "quoted" label', labels)
+
+    def test_generated(self):
+        state = random.getstate()
+        random.seed(3)
+        try:
+            with Board() as board:
+                items = list(Layout.build_graph(limit=200, ending=4, steps=20, exits=4))
+        finally:
+            random.setstate(state)
+        board.extend(items)
+
+        # The limit leaves some Edges without a Node at one end
+        short = [i for i in items if isinstance(i, Edge) and not all(i.ends)]
+        self.assertTrue(short)
+
+        rv = Tree(board).emit(self.parent)
+        self.assertEqual(set(rv.values()), {"written"})
+        for edge in short:
+            with self.subTest(edge=edge):
+                text = self.parent.joinpath(f"{edge.name}.toml").read_text()
+                self.assertEqual(text.count("spiki next"), len(edge.ends[1]))
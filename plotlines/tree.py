@@ -17,10 +17,15 @@
 # GNU General Public License along with Plotlines.
 # If not, see <https://www.gnu.org/licenses/>.
 
+from collections import Counter
+from collections import deque
+import concurrent.futures
 import datetime
 import importlib.resources
 import itertools
+import json
 import pathlib
+import re
 import sys
 import textwrap
 
@@ -30,135 +35,168 @@ from plotlines.board import Edge
 from plotlines.board import Node
 
 
-class Tree:
-    "Generates a tree of files suitable for Spiki processing"
+class Template(str):
+    "A fragment of Spiki TOML, dedented once when it is defined and filled by str.format."
 
-    @staticmethod
-    def index_comment(ts):
-        return f"# Generated {ts} by Plotlines {plotlines.__version__}"
+    # Characters which TOML does not allow as they are
+    unsafe = re.compile(r'[\x00-\x1f"\\\x7f]')
+    control = re.compile(r"[\x00-\x08\x0b-\x1f\x7f]")
 
-    @staticmethod
-    def base_head():
-        return importlib.resources.read_text("plotlines.assets", "head.toml")
+    def __new__(cls, text: str):
+        return super().__new__(cls, textwrap.dedent(text).lstrip())
 
-    @staticmethod
-    def base_link(path: pathlib.Path):
-        return textwrap.dedent(f"""
+    @classmethod
+    def quote(cls, text) -> str:
+        "Make a TOML basic string."
+        text = format(text)
+        if cls.unsafe.search(text) is None:
+            return f'"{text}"'
+        return json.dumps(text, ensure_ascii=False).replace("\x7f", "\\u007f")
+
+    @classmethod
+    def block(cls, text) -> str:
+        "Escape text for the body of a TOML multi-line basic string."
+        text = format(text).replace("\\", "\\\\").replace('"""', '""\\"')
+        return cls.control.sub(lambda m: f"\\u{ord(m.group(0)):04x}", text)
+
+
+class Tree:
+    "Generates a tree of files suitable for Spiki processing"
+
+    base_link_template = Template("""
         [[base.html.head.link]]
         config = {{tag_mode = "void"}}
-        attrib = {{rel= "stylesheet", href="{path.name}"}}
-        """).lstrip()
+        attrib = {{rel= "stylesheet", href={href}}}
+        """)
 
-    @staticmethod
-    def index_nav(board: Board):
-        yield textwrap.dedent("""
+    index_head_template = Template("""
         [base.html.body.header]
         attrib = {accesskey = "m", popovertarget = "nav-upper"}
         button = "≡"  # "IDENTICAL TO" (U+2261)
 
         [base.html.body.header.nav]
         attrib = {id="nav-upper", popover = "auto"}
-        """).lstrip()
+        """)
 
-        for item in board.items:
-            title = f"{item.__class__.__name__} {item.name}"
-            yield textwrap.dedent(f"""
-            [[base.html.body.header.nav.ul.li]]
-            attrib = {{class = "card"}}
+    index_item_template = Template("""
+        [[base.html.body.header.nav.ul.li]]
+        attrib = {{class = "card"}}
 
-            [base.html.body.header.nav.ul.li.div.span]
-            attrib = {{href = "{item.name}.html"}}
-            a = "{item.label}"
+        [base.html.body.header.nav.ul.li.div.span]
+        attrib = {{href = {href}}}
+        a = {label}
 
-            [base.html.body.header.nav.ul.li.div]
-            p = "{item.title or title}"
-            """).lstrip()
+        [base.html.body.header.nav.ul.li.div]
+        p = {title}
+        """)
 
-        yield textwrap.dedent("""
+    index_main_template = Template("""
         [base.html.body.main]
         config = {tag_mode = "pair", block_wrap = "div"}
-        """).lstrip()
+        """)
 
-        yield textwrap.dedent("""
+    index_home_template = Template("""
         [[base.html.body.footer.nav.ul.li]]
         attrib = {class = "spiki home", href = "index.html"}
         a = "Home"
-        """).lstrip()
+        """)
+
+    nav_template = Template("""
+        [[doc.html.body.footer.nav.ul.li]]
+        attrib = {{class = {kind}, href = {href}}}
+        a = {label}
+        """)
 
-        initial = board.initial or (nodes := [i for i in board.items if isinstance(i, Node)]) and nodes[:1]
-        for node in initial:
-            yield textwrap.dedent(f"""
-            [[doc.html.body.footer.nav.ul.li]]
-            attrib = {{class = "spiki next", href = "{node.name}.html"}}
-            a = "{node.title or 'Start'}"
-            """).lstrip()
+    meta_template = Template("""
+        [metadata]
+        title = {title}
+        """)
 
-    @staticmethod
-    def edge_comment(edge: Edge):
-        return f"# Edge '{edge.label}'\n"
+    blocks_template = Template('''
+        [doc.html.body.main]
+        blocks = """
+        {contents}
+        """
+        ''')
 
     @staticmethod
-    def edge_meta(edge: Edge):
-        return textwrap.dedent(f"""
-        [metadata]
-        title = "{edge.title}"
-        """).lstrip()
+    def index_comment(ts):
+        return f"# Generated {ts} by Plotlines {plotlines.__version__}"
 
     @staticmethod
-    def edge_nav(edge: Edge):
-        node = edge.joins[1]
-        return textwrap.dedent(f"""
-        [[doc.html.body.footer.nav.ul.li]]
-        attrib = {{class = "spiki next", href = "{node.name}.html"}}
-        a = "{node.title or 'Next'}"
-        """).lstrip()
+    def base_head():
+        return importlib.resources.read_text("plotlines.assets", "head.toml")
+
+    @classmethod
+    def base_link(cls, path: pathlib.Path):
+        return cls.base_link_template.format(href=Template.quote(path.name))
+
+    @classmethod
+    def link(cls, kind: str, href: str, label: str) -> str:
+        quote = Template.quote
+        return cls.nav_template.format(kind=quote(kind), href=quote(href), label=quote(label))
+
+    @classmethod
+    def index_nav(cls, board: Board):
+        yield cls.index_head_template
+
+        quote = Template.quote
+        template = cls.index_item_template
+        for item in board.items:
+            title = item.title or f"{item.__class__.__name__} {item.name}"
+            yield template.format(href=quote(f"{item.name}.html"), label=quote(item.label), title=quote(title))
+
+        yield cls.index_main_template
+        yield cls.index_home_template
+
+        # In the order of the Board, which does not depend on how its Registry was built
+        nodes = [i for i in board.items if isinstance(i, Node)]
+        initial = {i.uid for i in board.initial}
+        for node in [i for i in nodes if i.uid in initial] or nodes[:1]:
+            yield cls.link("spiki next", f"{node.name}.html", node.title or "Start")
 
     @staticmethod
-    def edge_blocks(edge: Edge):
+    def edge_comment(edge: Edge):
+        return f"# Edge '{edge.label}'\n"
+
+    @classmethod
+    def edge_meta(cls, edge: Edge):
+        return cls.meta_template.format(title=Template.quote(edge.title))
+
+    @classmethod
+    def edge_nav(cls, edge: Edge):
+        for node in edge.ends[1]:
+            yield cls.link("spiki next", f"{node.name}.html", node.title or "Next")
+
+    @classmethod
+    def edge_blocks(cls, edge: Edge):
         if isinstance(edge.contents, list):
             contents = "\n".join(i for i in edge.contents if isinstance(i, str))
         else:
             contents = edge.contents
-        return textwrap.dedent(f'''
-        [doc.html.body.main]
-        blocks = """
-        {contents}
-        """
-        ''').lstrip()
+        return cls.blocks_template.format(contents=Template.block(contents))
 
     @staticmethod
     def node_comment(node: Node):
         return f"# Node '{node.label}'\n"
 
-    @staticmethod
-    def node_meta(node: Node):
-        return textwrap.dedent(f"""
-        [metadata]
-        title = "{node.title}"
-        """).lstrip()
+    @classmethod
+    def node_meta(cls, node: Node):
+        return cls.meta_template.format(title=Template.quote(node.title))
 
-    @staticmethod
-    def node_nav(node: Node):
+    @classmethod
+    def node_nav(cls, node: Node):
         for edge in node.connections[1]:
             trail = edge.trail or "next"
-            yield textwrap.dedent(f"""
-            [[doc.html.body.footer.nav.ul.li]]
-            attrib = {{class = "spiki {trail}", href = "{edge.name}.html"}}
-            a = "{edge.title or edge.label or 'Next'}"
-            """).lstrip()
+            yield cls.link(f"spiki {trail}", f"{edge.name}.html", edge.title or edge.label or "Next")
 
-    @staticmethod
-    def node_blocks(node: Node):
+    @classmethod
+    def node_blocks(cls, node: Node):
         if isinstance(node.contents, list):
             contents = "\n".join(i for i in node.contents if isinstance(i, str))
         else:
             contents = node.contents
-        return textwrap.dedent(f'''
-        [doc.html.body.main]
-        blocks = """
-        {contents}
-        """
-        ''').lstrip()
+        return cls.blocks_template.format(contents=Template.block(contents))
 
     def __init__(self, board: Board):
         self.board = board
@@ -176,7 +214,7 @@ class Tree:
 
         nodes = [i for i in self.board.items if isinstance(i, Node)]
         for node in nodes:
-            path = parent.joinpath(node.name).with_suffix(".toml")
+            path = parent.joinpath(f"{node.name}.toml")
             text = "\n".join(itertools.chain(
                 [self.node_comment(node), self.node_meta(node)], self.node_nav(node), [self.node_blocks(node)]
             ))
@@ -184,6 +222,81 @@ class Tree:
 
         edges = [i for i in self.board.items if isinstance(i, Edge)]
         for edge in edges:
-            path = parent.joinpath(edge.name).with_suffix(".toml")
-            text = "\n".join((self.edge_comment(edge), self.edge_meta(edge), self.edge_nav(edge), self.edge_blocks(edge)))
+            path = parent.joinpath(f"{edge.name}.toml")
+            text = "\n".join(itertools.chain(
+                [self.edge_comment(edge), self.edge_meta(edge)], self.edge_nav(edge), [self.edge_blocks(edge)]
+            ))
             yield text, path
+
+    @classmethod
+    def body(cls, text: str) -> str:
+        "Text without the comment which records when it was generated."
+        head, sep, tail = text.partition("\n")
+        return tail if head.startswith("# Generated ") else text
+
+    @classmethod
+    def put(cls, text: str, path: pathlib.Path, compare: bool = False) -> str:
+        "Write text to a file, unless `compare` finds it there already. Return what was done."
+        if compare:
+            try:
+                if cls.body(path.read_text()) == cls.body(text):
+                    return "unchanged"
+            except (FileNotFoundError, UnicodeDecodeError):
+                pass
+        path.write_text(text)
+        return "written"
+
+    @staticmethod
+    def tally(outcomes: dict[pathlib.Path, str | Exception]) -> Counter:
+        "Count files by outcome: written, unchanged, deleted or failed."
+        rv = Counter(written=0, unchanged=0, deleted=0)
+        rv.update(i if isinstance(i, str) else "failed" for i in outcomes.values())
+        return rv
+
+    def emit(
+        self, parent: pathlib.Path, ts: datetime.datetime = None, workers: int = 8, compare: bool = False
+    ) -> dict[pathlib.Path, str | Exception]:
+        """
+        Generate files in order, and write them through a pool of `workers` threads.
+        No more than twice that number of files wait to be written at any time.
+
+        Return the outcome for each file in the order they were generated,
+        which is the exception raised if writing it failed.
+
+        """
+        rv = dict()
+        pending = deque()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            for text, path in self(parent, ts=ts):
+                if len(pending) >= 2 * workers:
+                    self.settle(*pending.popleft(), rv)
+                rv[path] = None
+                pending.append((path, pool.submit(self.put, text, path, compare=compare)))
+            while pending:
+                self.settle(*pending.popleft(), rv)
+        return rv
+
+    @staticmethod
+    def settle(path: pathlib.Path, future: concurrent.futures.Future, outcomes: dict):
+        try:
+            outcomes[path] = future.result()
+        except Exception as error:
+            outcomes[path] = error
+
+    def sync(
+        self, parent: pathlib.Path, ts: datetime.datetime = None, workers: int = 8
+    ) -> dict[pathlib.Path, str | Exception]:
+        """
+        Write only those files whose text differs from what is on disk, and
+        delete files which are no longer generated. Return the outcome for each file.
+
+        """
+        rv = self.emit(parent, ts=ts, workers=workers, compare=True)
+        for path in sorted(parent.iterdir()):
+            if path.is_file() and path not in rv:
+                try:
+                    path.unlink()
+                    rv[path] = "deleted"
+                except OSError as error:
+                    rv[path] = error
+        return rv